@@ -0,0 +1,38 @@
+"""trigram index for /users/search
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must stay identical to crud.USER_SEARCH_TEXT for the planner to use the index.
+SEARCH_TEXT = "name || ' ' || email || ' ' || badge_number"
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # GiST rather than GIN: it can return rows already ordered by trigram
+    # distance, so a LIMIT-ed ranked search stops after the first matches
+    # instead of scoring every row that shares a trigram with the query. The
+    # larger signature keeps ~50-character strings from saturating it.
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_search_trgm "
+            f"ON users USING gist (({SEARCH_TEXT}) gist_trgm_ops(siglen=64))"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_users_search_trgm")
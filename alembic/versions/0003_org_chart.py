@@ -0,0 +1,89 @@
+"""employees, employee_manager and the user_hierarchy closure table
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Already there when the app's create_all ran first.
+    if not context.is_offline_mode() and sa.inspect(op.get_bind()).has_table(
+        "employees"
+    ):
+        return
+    op.create_table(
+        "employees",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "user_id",
+            postgresql.UUID(),
+            sa.ForeignKey("users.id"),
+            nullable=False,
+            unique=True,
+        ),
+        sa.Column("avatar_url", sa.String()),
+        sa.Column("phone", sa.String()),
+        sa.Column("job_position", sa.String()),
+        sa.Column("department", sa.String()),
+        sa.Column("work_location", sa.String()),
+        sa.Column("summary", sa.Text()),
+    )
+    op.create_table(
+        "employee_manager",
+        sa.Column(
+            "employee_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("employees.id"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "manager_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("users.id"),
+            primary_key=True,
+        ),
+    )
+    op.create_index(
+        "ix_employee_manager_manager_id", "employee_manager", ["manager_id"]
+    )
+    op.create_table(
+        "user_hierarchy",
+        sa.Column(
+            "ancestor_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("users.id"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "descendant_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("users.id"),
+            primary_key=True,
+        ),
+        sa.Column("depth", sa.Integer(), nullable=False),
+    )
+    op.create_index(
+        "ix_user_hierarchy_descendant_depth",
+        "user_hierarchy",
+        ["descendant_id", "depth"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_hierarchy")
+    op.drop_table("employee_manager")
+    op.drop_table("employees")
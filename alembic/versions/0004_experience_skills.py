@@ -0,0 +1,89 @@
+"""experiences, projects and the language/framework/server catalogs
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CATALOGS = (
+    ("programming_languages", "language", "project_programming_language"),
+    ("frameworks", "framework", "project_framework"),
+    ("servers", "server", "project_server"),
+)
+
+
+def upgrade() -> None:
+    # Already there when the app's create_all ran first.
+    if not context.is_offline_mode() and sa.inspect(op.get_bind()).has_table(
+        "experiences"
+    ):
+        return
+    op.create_table(
+        "experiences",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("employee_id", postgresql.UUID(), sa.ForeignKey("employees.id")),
+        sa.Column("company_name", sa.String()),
+        sa.Column("position", sa.String()),
+        sa.Column("start_date", sa.Date()),
+        sa.Column("end_date", sa.Date()),
+        sa.Column("description", sa.Text()),
+    )
+    op.create_index("ix_experiences_employee_id", "experiences", ["employee_id"])
+    op.create_table(
+        "experience_projects",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("experience_id", postgresql.UUID(), sa.ForeignKey("experiences.id")),
+        sa.Column("name", sa.String()),
+        sa.Column("overview", sa.Text()),
+        sa.Column("team_size", sa.Integer()),
+        sa.Column("website", sa.String()),
+        sa.Column("position", sa.String()),
+        sa.Column("responsibility", sa.Text()),
+    )
+    op.create_index(
+        "ix_experience_projects_experience_id",
+        "experience_projects",
+        ["experience_id"],
+    )
+    for table, name, link in CATALOGS:
+        op.create_table(
+            table,
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column(name, sa.String(), nullable=False),
+        )
+        op.create_table(
+            link,
+            sa.Column(
+                "experience_project_id",
+                postgresql.UUID(as_uuid=True),
+                sa.ForeignKey("experience_projects.id"),
+                primary_key=True,
+            ),
+            sa.Column(
+                f"{table.removesuffix('s')}_id",
+                postgresql.UUID(as_uuid=True),
+                sa.ForeignKey(f"{table}.id"),
+                primary_key=True,
+            ),
+        )
+
+
+def downgrade() -> None:
+    for table, _, link in CATALOGS:
+        op.drop_table(link)
+        op.drop_table(table)
+    op.drop_table("experience_projects")
+    op.drop_table("experiences")
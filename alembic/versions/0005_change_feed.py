@@ -0,0 +1,80 @@
+"""change-feed versions on users and roles, and tombstones for deletes
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TXID = sa.text("txid_current()")
+
+
+def upgrade() -> None:
+    # The columns and table are already there when the app's create_all ran
+    # first; the trigger below is not, so it is (re)created regardless.
+    if context.is_offline_mode() or not sa.inspect(op.get_bind()).has_table(
+        "tombstones"
+    ):
+        # Existing rows all get this migration's transaction id.
+        op.add_column(
+            "users",
+            sa.Column("version", sa.BigInteger(), nullable=False, server_default=TXID),
+        )
+        op.add_column(
+            "roles",
+            sa.Column("version", sa.BigInteger(), nullable=False, server_default=TXID),
+        )
+        op.create_index("ix_users_version_id", "users", ["version", "id"])
+        op.create_table(
+            "tombstones",
+            sa.Column("entity", sa.String(), primary_key=True),
+            sa.Column("entity_id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column("version", sa.BigInteger(), nullable=False, server_default=TXID),
+            sa.Column(
+                "deleted_at",
+                sa.DateTime(timezone=True),
+                nullable=False,
+                server_default=sa.func.now(),
+            ),
+        )
+        op.create_index(
+            "ix_tombstones_version_id", "tombstones", ["version", "entity_id"]
+        )
+    op.execute("""
+        CREATE OR REPLACE FUNCTION record_tombstone() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO tombstones (entity, entity_id) VALUES (TG_TABLE_NAME, OLD.id)
+            ON CONFLICT DO NOTHING;
+            RETURN OLD;
+        END
+        $$
+        """)
+    for table in ("users", "roles"):
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_tombstone ON {table}")
+        op.execute(
+            f"CREATE TRIGGER {table}_tombstone AFTER DELETE ON {table} "
+            "FOR EACH ROW EXECUTE FUNCTION record_tombstone()"
+        )
+
+
+def downgrade() -> None:
+    for table in ("users", "roles"):
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_tombstone ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS record_tombstone()")
+    op.drop_table("tombstones")
+    op.drop_index("ix_users_version_id", table_name="users")
+    op.drop_column("roles", "version")
+    op.drop_column("users", "version")
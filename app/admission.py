@@ -0,0 +1,209 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from . import auth
+from . import metrics
+from .cache import MISSING
+
+# Requests served at once per route class; 0 removes the limit. Keep the sum
+# of read and write near DB_POOL_SIZE + DB_MAX_OVERFLOW so requests wait
+# here, with a deadline, rather than in the pool for DB_POOL_TIMEOUT.
+ADMISSION_READ_LIMIT = int(os.getenv("ADMISSION_READ_LIMIT", 12))
+ADMISSION_WRITE_LIMIT = int(os.getenv("ADMISSION_WRITE_LIMIT", 4))
+ADMISSION_BULK_LIMIT = int(os.getenv("ADMISSION_BULK_LIMIT", 1))
+# Requests allowed to wait for a slot per class, and for how long.
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", 64))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 2))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", 1))
+
+# Token bucket per client address, or per bearer token once that token has
+# been verified (it is in auth.token_cache): refills at RATE_LIMIT_PER_SECOND
+# up to RATE_LIMIT_BURST; a rate of 0 disables it.
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", 20))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", 40))
+RATE_LIMIT_CLIENTS = int(os.getenv("RATE_LIMIT_CLIENTS", 10000))
+
+# Monitoring and docs stay reachable while the API is shedding load.
+EXEMPT_PREFIXES = ("/metrics", "/internal/", "/docs", "/redoc", "/openapi.json")
+BULK_PATHS = {"/users/import", "/users/export"}
+# Lookups that take their keys in a POST body but only read.
+READ_POSTS = {"/users/batch"}
+
+
+def route_class(method: str, path: str):
+    """Return "bulk", "read" or "write"; None for exempt paths."""
+    if path.startswith(EXEMPT_PREFIXES):
+        return None
+    if path in BULK_PATHS:
+        return "bulk"
+    if method in ("GET", "HEAD") or (method == "POST" and path in READ_POSTS):
+        return "read"
+    return "write"
+
+
+class Gate:
+    """At most ``limit`` holders, at most ``queue_size`` waiters, each for at
+    most ``timeout`` seconds."""
+
+    def __init__(self, limit: int, queue_size: int, timeout: float):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(limit) if limit > 0 else None
+
+    async def acquire(self):
+        if self._semaphore is None:
+            self.in_flight += 1
+            return True
+        if self._semaphore.locked():
+            if self.waiting >= self.queue_size:
+                return False
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+        }
+
+
+class TokenBuckets:
+    """Token buckets keyed by client, the least recently seen evicted first.
+
+    Only touched from the event loop, so no lock.
+    """
+
+    def __init__(self, rate: float, burst: float, maxsize: int):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self._buckets: OrderedDict = OrderedDict()
+
+    def take(self, key: str):
+        """Spend one token; return 0 on success, else seconds until one refills."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+def client_key(scope):
+    """Bucket key for a request.
+
+    Unverified tokens are attacker-chosen, so keying on them would let one
+    client mint a fresh bucket per request and evict everyone else's. They
+    share their address's bucket until auth has verified them.
+    """
+    token = Headers(scope=scope).get("authorization")
+    if token:
+        entry = auth.token_cache.peek(token)
+        if entry is not MISSING and entry[1] is not None:
+            return "token:" + token
+    return "addr:" + (scope.get("client") or ("unknown",))[0]
+
+
+def _reject(status: int, detail: str, retry_after: float):
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware shedding load before it reaches the pool or Zoho.
+
+    Each request first spends a token from its client's bucket (429 when
+    empty), then takes a slot for its route class, waiting in a bounded queue
+    up to ADMISSION_QUEUE_TIMEOUT (503 when the queue is full or the wait
+    times out). Both answers carry Retry-After. Limits are per worker.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.gates = {
+            "read": Gate(
+                ADMISSION_READ_LIMIT, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT
+            ),
+            "write": Gate(
+                ADMISSION_WRITE_LIMIT, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT
+            ),
+            "bulk": Gate(
+                ADMISSION_BULK_LIMIT, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT
+            ),
+        }
+        self.buckets = None
+        if RATE_LIMIT_PER_SECOND > 0:
+            self.buckets = TokenBuckets(
+                RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST, RATE_LIMIT_CLIENTS
+            )
+        admission_gates.update(self.gates)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        kind = route_class(scope["method"], scope["path"])
+        if kind is None:
+            return await self.app(scope, receive, send)
+
+        if self.buckets is not None:
+            wait = self.buckets.take(client_key(scope))
+            if wait:
+                metrics.admission_rejections.inc(kind, "rate_limited")
+                response = _reject(429, "Rate limit exceeded", wait)
+                return await response(scope, receive, send)
+
+        gate = self.gates[kind]
+        if not await gate.acquire():
+            metrics.admission_rejections.inc(kind, "overloaded")
+            response = _reject(
+                503, "Server busy, try again later", ADMISSION_RETRY_AFTER
+            )
+            return await response(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
+
+
+# Gates of the installed middleware, for /internal/admission.
+admission_gates: dict[str, Gate] = {}
+
+
+def stats():
+    return {kind: gate.stats() for kind, gate in admission_gates.items()}
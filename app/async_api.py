@@ -0,0 +1,141 @@
+from typing import Annotated
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import changes, crud, crud_async, etag, roles, schemas, serializers
+from .auth import check_can_upsert, get_zoho_user_async
+from .database import get_async_db, get_async_read_db
+from .pagination import decode_id_cursor, set_next_cursor
+
+# Event-loop implementations of the core endpoints in main.py, mounted instead
+# of the threadpool ones when DB_ASYNC is enabled.
+router = APIRouter()
+
+
+@router.get("/roles/", response_model=list[schemas.Role])
+async def read_roles(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    tag: str = Depends(etag.conditional("roles", etag.roles_version_async)),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    roles_page = (await roles.current_async(db)).page(
+        skip=skip, limit=limit, after=decode_id_cursor(cursor)
+    )
+    set_next_cursor(response, roles_page, limit)
+    return etag.render(
+        tag,
+        response,
+        serializers.dumps([serializers.role_dict(role) for role in roles_page]),
+    )
+
+
+@router.post("/roles/", response_model=schemas.Role)
+async def create_role(
+    role: schemas.RoleBase,
+    db: AsyncSession = Depends(get_async_db),
+):
+    if (await roles.current_async(db)).get_by_name(role.role):
+        raise HTTPException(status_code=400, detail="Role name already registered")
+    try:
+        return await crud_async.create_role(db=db, role=role)
+    except IntegrityError:
+        # Created by another worker since this one last loaded the catalog.
+        raise HTTPException(status_code=400, detail="Role name already registered")
+
+
+@router.get("/users/", response_model=list[schemas.User])
+async def read_users(
+    response: Response,
+    current_user: Annotated[schemas.User, Depends(get_zoho_user_async)],
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    fields: str | None = None,
+    tag: str = Depends(etag.conditional("users", etag.users_version_async)),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    users = await crud_async.get_user_dicts(
+        db,
+        skip=skip,
+        limit=limit,
+        after=decode_id_cursor(cursor),
+        fields=crud.parse_user_fields(fields),
+    )
+    set_next_cursor(response, users, limit)
+    return etag.render(tag, response, serializers.dumps(users))
+
+
+@router.get("/users/search", response_model=list[schemas.User])
+async def search_users(
+    current_user: Annotated[schemas.User, Depends(get_zoho_user_async)],
+    q: Annotated[str, Query(min_length=3, max_length=100)],
+    limit: Annotated[int, Query(ge=1, le=50)] = 20,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    return await crud_async.search_users(db, q=q, limit=limit)
+
+
+@router.get("/users/changes", response_model=schemas.UserChanges)
+async def read_user_changes(
+    current_user: Annotated[schemas.User, Depends(get_zoho_user_async)],
+    since: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=changes.CHANGES_MAX_LIMIT)] = 100,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    feed = await crud_async.get_user_changes(
+        db, since=changes.decode_token(since), limit=limit
+    )
+    return Response(serializers.dumps(feed), media_type="application/json")
+
+
+@router.post("/users/batch", response_model=schemas.UserBatchResult)
+async def lookup_users(
+    current_user: Annotated[schemas.User, Depends(get_zoho_user_async)],
+    lookup: schemas.UserBatchLookup,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    keys = crud.batch_lookup_keys(lookup)
+    users = (
+        await crud_async.get_user_dicts_by(db, lookup.by, list(keys)) if keys else []
+    )
+    return Response(
+        serializers.dumps(crud.batch_lookup_result(lookup.by, keys, users)),
+        media_type="application/json",
+    )
+
+
+@router.post("/users/", response_model=schemas.User)
+async def create_user(
+    user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)
+):
+    missing = await roles.missing_role_ids_async(db, user.roles)
+    if missing:
+        raise HTTPException(
+            status_code=400, detail=f"Role with id {missing[0]} does not exist"
+        )
+    try:
+        return await crud_async.create_user(db=db, user=user)
+    except IntegrityError as exc:
+        raise HTTPException(status_code=400, detail=crud.integrity_error_detail(exc))
+
+
+@router.put("/users/", response_model=schemas.User)
+async def upsert_user(
+    user: schemas.UserCreate,
+    current_user: Annotated[schemas.User, Depends(get_zoho_user_async)],
+    db: AsyncSession = Depends(get_async_db),
+):
+    check_can_upsert(current_user, user)
+    missing = await roles.missing_role_ids_async(db, user.roles)
+    if missing:
+        raise HTTPException(
+            status_code=400, detail=f"Role with id {missing[0]} does not exist"
+        )
+    try:
+        return await crud_async.upsert_user(db=db, user=user)
+    except IntegrityError as exc:
+        raise HTTPException(status_code=400, detail=crud.integrity_error_detail(exc))
@@ -1,19 +1,45 @@
+import asyncio
 import os
-import requests
+import time
+import httpx
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
+from typing import Annotated
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from . import models
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import OAuth2
+from starlette.datastructures import Headers
 from . import crud
+from . import crud_async
 from . import schemas
 from . import database
+from . import metrics
+from .cache import MISSING, AsyncSingleFlight, TTLCache
 
 load_dotenv()
 
+ZOHO_USER_INFO_URL = "https://accounts.zoho.com/oauth/user/info"
+ZOHO_TIMEOUT = float(os.getenv("ZOHO_TIMEOUT", 5))
+ZOHO_MAX_CONNECTIONS = int(os.getenv("ZOHO_MAX_CONNECTIONS", 100))
+ZOHO_MAX_KEEPALIVE = int(os.getenv("ZOHO_MAX_KEEPALIVE", 20))
+ZOHO_RETRIES = int(os.getenv("ZOHO_RETRIES", 2))
+ZOHO_BACKOFF = float(os.getenv("ZOHO_BACKOFF", 0.2))
+ZOHO_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+oauth2_scheme = OAuth2()
+
+# Users holding the role with this name may manage other users.
+ADMIN_ROLE = os.getenv("ADMIN_ROLE", "admin")
+
+# Zoho token -> (email, schemas.User | None). A revoked token keeps working for
+# at most TOKEN_CACHE_TTL seconds.
+token_cache = TTLCache(
+    maxsize=int(os.getenv("TOKEN_CACHE_SIZE", 10000)),
+    ttl=float(os.getenv("TOKEN_CACHE_TTL", 300)),
+)
+_async_verifications = AsyncSingleFlight()
+
 
 # def create_access_token(data: dict, expires_delta: timedelta | None = None):
 #     to_encode = data.copy()
@@ -52,13 +78,158 @@ load_dotenv()
 #     return user
 
 
-def verify_zoho_user(token: str, db: Session = Depends(database.get_db)):
-    res = requests.get(
-        "https://accounts.zoho.com/oauth/user/info",
-        headers={"Authorization": token},
+def forget_users(emails, user_ids=()):
+    """Drop cached verifications for users whose rows were created or changed."""
+    emails, user_ids = set(emails), set(user_ids)
+    token_cache.discard_where(
+        lambda entry: entry[0] in emails
+        or (entry[1] is not None and entry[1].id in user_ids)
+    )
+
+
+def _load_user_snapshot(db: Session, email: str):
+    db_user = crud.get_user_by_email(db, email)
+    if not db_user:
+        return None
+    return schemas.User.model_validate(db_user, from_attributes=True)
+
+
+def create_zoho_client() -> httpx.AsyncClient:
+    """Build the pooled client shared by all requests; owned by the app lifespan."""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(ZOHO_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=ZOHO_MAX_CONNECTIONS,
+            max_keepalive_connections=ZOHO_MAX_KEEPALIVE,
+        ),
     )
-    if res.status_code == 200:
-        email = res.json().get("Email", None)
-        db_user = crud.get_user_by_email(db, email)
-        return db_user if db_user else False
-    return False
+
+
+async def _fetch_zoho_user_info(client: httpx.AsyncClient, token: str):
+    for attempt in range(ZOHO_RETRIES + 1):
+        last_attempt = attempt == ZOHO_RETRIES
+        start = time.perf_counter()
+        try:
+            res = await client.get(ZOHO_USER_INFO_URL, headers={"Authorization": token})
+        except httpx.TransportError:
+            metrics.zoho_request_duration.observe(
+                "error", value=time.perf_counter() - start
+            )
+            if last_attempt:
+                raise
+        else:
+            metrics.zoho_request_duration.observe(
+                str(res.status_code), value=time.perf_counter() - start
+            )
+            if res.status_code not in ZOHO_RETRY_STATUSES:
+                return res
+            if last_attempt:
+                # Still throttled or failing: Zoho is unavailable, which is
+                # not the same as the token being invalid.
+                res.raise_for_status()
+        await asyncio.sleep(ZOHO_BACKOFF * 2**attempt)
+
+
+async def _load_user_snapshot_async(db: AsyncSession, email: str):
+    db_user = await crud_async.get_user_by_email(db, email)
+    if not db_user:
+        return None
+    return schemas.User.model_validate(db_user, from_attributes=True)
+
+
+async def _verify_zoho_token_async(token: str, client: httpx.AsyncClient, load_user):
+    res = await _fetch_zoho_user_info(client, token)
+    if res.status_code != 200:
+        return None
+    email = res.json().get("Email", None)
+    user = await load_user(email)
+    token_cache.set(token, (email, user))
+    return email, user
+
+
+async def verify_zoho_user_async(token: str, client: httpx.AsyncClient, load_user):
+    """``load_user`` is a coroutine function mapping a Zoho email to a snapshot."""
+    entry = token_cache.get(token)
+    if entry is MISSING:
+        entry = await _async_verifications.do(
+            token, lambda: _verify_zoho_token_async(token, client, load_user)
+        )
+    if entry is None or entry[1] is None:
+        return False
+    return entry[1]
+
+
+async def _authenticate(request: Request, token: str, load_user):
+    try:
+        user = await verify_zoho_user_async(
+            token, request.app.state.zoho_client, load_user
+        )
+    except httpx.HTTPError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Zoho is unavailable",
+        )
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+
+async def get_zoho_user(
+    request: Request,
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: Session = Depends(database.get_db),
+):
+    return await _authenticate(
+        request,
+        token,
+        lambda email: run_in_threadpool(_load_user_snapshot, db, email),
+    )
+
+
+async def get_zoho_user_async(
+    request: Request,
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    return await _authenticate(
+        request, token, lambda email: _load_user_snapshot_async(db, email)
+    )
+
+
+def is_admin(user: schemas.User):
+    return any(role.role == ADMIN_ROLE for role in user.roles)
+
+
+def is_verified_admin(scope):
+    """Whether an ASGI request carries a token auth has already verified as an
+    admin's. For middleware, which runs before the auth dependencies."""
+    token = Headers(scope=scope).get("authorization")
+    entry = token_cache.peek(token) if token else MISSING
+    return entry is not MISSING and entry[1] is not None and is_admin(entry[1])
+
+
+def check_can_upsert(current_user: schemas.User, user: schemas.UserCreate):
+    """Admins may write any user; others only themselves, roles unchanged."""
+    if is_admin(current_user):
+        return
+    if user.email != current_user.email or set(user.roles) != {
+        role.id for role in current_user.roles
+    }:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not allowed to modify this user",
+        )
+
+
+async def get_admin_user(
+    current_user: Annotated[schemas.User, Depends(get_zoho_user)],
+):
+    if not is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Admin role required"
+        )
+    return current_user
@@ -0,0 +1,127 @@
+import os
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import String, cast, func, literal, select, tuple_, union_all
+
+from . import models
+from . import serializers
+from .pagination import decode_cursor, encode_cursor
+
+CHANGES_MAX_LIMIT = int(os.getenv("CHANGES_MAX_LIMIT", 1000))
+
+# Versions are transaction ids rather than a sequence or a timestamp: writers
+# can commit out of order, so a reader that remembered the highest version it
+# had seen would skip rows from a slower transaction that committed later.
+# Every transaction below the xmin of the reader's snapshot has finished, so
+# the feed only hands out versions under it and a token never moves past a
+# row that can still appear.
+HORIZON = func.txid_snapshot_xmin(func.txid_current_snapshot())
+
+# (kind, deleted, version column, id column, extra condition)
+SOURCES = (
+    ("user", False, models.User.version, models.User.id, None),
+    ("role", False, models.Role.version, models.Role.id, None),
+    (
+        "user",
+        True,
+        models.tombstones.c.version,
+        models.tombstones.c.entity_id,
+        models.tombstones.c.entity == "users",
+    ),
+    (
+        "role",
+        True,
+        models.tombstones.c.version,
+        models.tombstones.c.entity_id,
+        models.tombstones.c.entity == "roles",
+    ),
+)
+
+
+def decode_token(token: str | None) -> tuple[int, UUID] | None:
+    if token is None:
+        return None
+    try:
+        version, last_id = decode_cursor(token)
+        return int(version), UUID(last_id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid change token")
+
+
+def changes_statement(since: tuple[int, UUID] | None, limit: int):
+    """(version, id, kind, deleted) rows after ``since``, oldest first.
+
+    Each branch walks its own (version, id) index; Postgres merges them.
+    """
+    parts = []
+    for kind, deleted, version, entity_id, condition in SOURCES:
+        query = select(
+            version.label("version"),
+            entity_id.label("id"),
+            literal(kind).label("kind"),
+            literal(deleted).label("deleted"),
+        ).where(version < HORIZON)
+        if condition is not None:
+            query = query.where(condition)
+        if since is not None:
+            query = query.where(tuple_(version, entity_id) > tuple_(*since))
+        parts.append(query)
+    changed = union_all(*parts).subquery("changed")
+    return select(changed).order_by(changed.c.version, changed.c.id).limit(limit)
+
+
+def live_ids(rows, kind: str):
+    return [row.id for row in rows if row.kind == kind and not row.deleted]
+
+
+def feed(rows, users: list[dict], role_catalog, since, limit: int):
+    """Assemble the /users/changes body from changes_statement rows and the
+    current state of the users and roles they name."""
+    deleted = {"user": [], "role": []}
+    for row in rows:
+        if row.deleted:
+            deleted[row.kind].append(row.id)
+    # A role deleted between the two queries has a tombstone on a later page.
+    role_list = filter(None, map(role_catalog.get, live_ids(rows, "role")))
+    if rows:
+        last = rows[-1]
+        since = (last.version, last.id)
+    return {
+        "users": users,
+        "roles": [serializers.role_dict(role) for role in role_list],
+        "deleted_users": deleted["user"],
+        "deleted_roles": deleted["role"],
+        "next": encode_cursor(*(since or (0, UUID(int=0)))),
+        "more": len(rows) >= limit,
+    }
+
+
+def users_state_statement():
+    """(latest version, snapshot) of everything the user list is built from."""
+    latest = func.greatest(
+        *(
+            select(func.max(version)).scalar_subquery()
+            for version in (
+                models.User.version,
+                models.Role.version,
+                models.tombstones.c.version,
+            )
+        )
+    )
+    return select(latest, cast(func.txid_current_snapshot(), String))
+
+
+def state_token(latest: int | None, snapshot: str):
+    """Collapse a users_state_statement row into a string that changes with
+    every committed write.
+
+    The latest version alone misses a writer that commits after a newer one,
+    but until it does its transaction id is in the snapshot's in-progress
+    list, below the latest version.
+    """
+    latest = latest or 0
+    # "xmin:xmax:xid,xid,..." with the in-progress ids in ascending order.
+    in_progress = snapshot.split(":")[2].split(",")
+    running = [xid for xid in in_progress if xid and int(xid) < latest]
+    return f"{latest}:{','.join(running)}"
@@ -0,0 +1,129 @@
+import os
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # gzip is always available
+    brotli = None
+
+# Bodies smaller than this go out as they are: below roughly a packet the
+# header overhead and CPU outweigh the saving.
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", 6))
+# Brotli quality 4 compresses JSON better than gzip -6 at similar CPU cost;
+# the higher qualities are meant for static assets.
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", 4))
+
+
+def negotiate(accept_encoding: str):
+    """Pick "br" or "gzip" from an Accept-Encoding header, or None."""
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    wildcard = weights.get("*", 0.0)
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    # max() keeps the first of equal weights, so brotli wins ties.
+    best = max(candidates, key=lambda coding: weights.get(coding, wildcard))
+    return best if weights.get(best, wildcard) > 0 else None
+
+
+class _Gzip:
+    def __init__(self):
+        self._compressor = zlib.compressobj(
+            COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+        )
+
+    def compress(self, data: bytes):
+        return self._compressor.compress(data)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+
+    def compress(self, data: bytes):
+        return self._compressor.process(data)
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+ENCODERS = {"gzip": _Gzip, "br": _Brotli}
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing responses with brotli or gzip,
+    whichever the client prefers, once they reach ``minimum_size`` bytes.
+
+    Responses that already carry a Content-Encoding, and bodiless ones such
+    as 304s, pass through untouched. Streamed bodies are compressed chunk by
+    chunk.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        coding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if coding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        encoder = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, encoder, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                return await send(message)
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                headers = MutableHeaders(scope=start)
+                if "content-encoding" in headers or not (body or more_body):
+                    passthrough = True
+                    await send(start)
+                    return await send(message)
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    return await send(message)
+                encoder = ENCODERS[coding]()
+                headers["Content-Encoding"] = coding
+                body = encoder.compress(body)
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    body += encoder.finish()
+                    headers["Content-Length"] = str(len(body))
+                await send(start)
+            else:
+                body = encoder.compress(body)
+                if not more_body:
+                    body += encoder.finish()
+            await send(
+                {"type": "http.response.body", "body": body, "more_body": more_body}
+            )
+
+        await self.app(scope, receive, send_wrapper)
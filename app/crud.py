@@ -1,8 +1,34 @@
-from sqlalchemy.orm import Session
+import os
+import uuid
+from uuid import UUID
+from sqlalchemy import (
+    Float,
+    String,
+    column,
+    delete,
+    func,
+    insert,
+    literal,
+    literal_column,
+    select,
+    true,
+    tuple_,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
 from fastapi import HTTPException
 from . import models
 from . import schemas
 from . import auth
+from . import changes
+from . import hierarchy
+from . import roles
+from . import serializers
+from . import skills
 
 
 def create_role(db: Session, role: schemas.RoleBase):
@@ -10,11 +36,15 @@ def create_role(db: Session, role: schemas.RoleBase):
     db.add(db_role)
     db.commit()
     db.refresh(db_role)
+    roles.role_cache.add(db_role)
     return db_role
 
 
-def get_roles(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Role).offset(skip).limit(limit).all()
+def get_roles(db: Session, skip: int = 0, limit: int = 100, after: UUID | None = None):
+    query = db.query(models.Role).order_by(models.Role.id)
+    if after is not None:
+        return query.filter(models.Role.id > after).limit(limit).all()
+    return query.offset(skip).limit(limit).all()
 
 
 def get_role_by_role(db: Session, role: str):
@@ -25,79 +55,607 @@ def get_role_by_id(db: Session, role_id: str):
     return db.query(models.Role).filter(models.Role.id == role_id).first()
 
 
-def create_user(db: Session, user: schemas.UserCreate):
-    db_user = models.User(
+USER_CONSTRAINT_ERRORS = {
+    "ix_users_email": "Email already registered",
+    "users_email_key": "Email already registered",
+    "users_badge_number_key": "Badge number already registered",
+    "user_role_role_id_fkey": "Role does not exist",
+}
+
+
+def integrity_error_detail(exc: IntegrityError):
+    """Map a unique/foreign-key violation on users to the API's 400 message."""
+    diag = getattr(exc.orig, "diag", None)
+    constraint = getattr(diag, "constraint_name", None) or getattr(
+        exc.orig.__cause__, "constraint_name", None
+    )
+    if constraint in USER_CONSTRAINT_ERRORS:
+        return USER_CONSTRAINT_ERRORS[constraint]
+    message = str(exc.orig)
+    for key, detail in (
+        ("(badge_number)", "Badge number already registered"),
+        ("(email)", "Email already registered"),
+        ("(role_id)", "Role does not exist"),
+    ):
+        if key in message:
+            return detail
+    return "User violates a database constraint"
+
+
+def user_snapshot(user_id: UUID, user: schemas.UserCreate):
+    # Built from the request and the role catalog instead of re-reading the row.
+    # Callers have written the user, so its roles exist (the foreign key held);
+    # they run missing_role_ids first to make sure this worker knows them.
+    role_ids = list(dict.fromkeys(user.roles))
+    return schemas.User(
+        id=user_id,
         name=user.name,
         email=user.email,
         badge_number=user.badge_number,
+        roles=[roles.role_cache.get(role_id) for role_id in role_ids],
+    )
+
+
+def create_user_statement(user: schemas.UserCreate):
+    # INSERT ... RETURNING for the user; its user_role rows ride along in a
+    # data-modifying CTE so both land in a single round trip.
+    new_user = (
+        insert(models.User)
+        .values(name=user.name, email=user.email, badge_number=user.badge_number)
+        .returning(models.User.id)
+    )
+    role_ids = list(dict.fromkeys(user.roles))
+    if not role_ids:
+        return new_user
+    new_user = new_user.cte("new_user")
+    requested = values(column("role_id", PG_UUID(as_uuid=True)), name="requested")
+    requested = requested.data([(role_id,) for role_id in role_ids])
+    return (
+        insert(models.user_role)
+        .from_select(
+            ["user_id", "role_id"],
+            select(new_user.c.id, requested.c.role_id).select_from(
+                new_user.join(requested, true())
+            ),
+        )
+        .returning(models.user_role.c.user_id)
+    )
+
+
+def create_user(db: Session, user: schemas.UserCreate):
+    """Raise IntegrityError on a duplicate email/badge or an unknown role."""
+    user_id = db.execute(create_user_statement(user)).scalars().first()
+    db.commit()
+    auth.forget_users([user.email], [user_id])
+    roles.missing_role_ids(db, user.roles)
+    return user_snapshot(user_id, user)
+
+
+def upsert_user_statements(user: schemas.UserCreate):
+    upsert = pg_insert(models.User).values(
+        name=user.name, email=user.email, badge_number=user.badge_number
+    )
+    return upsert.on_conflict_do_update(
+        index_elements=[models.User.email],
+        set_={
+            "name": upsert.excluded.name,
+            "badge_number": upsert.excluded.badge_number,
+            "version": func.txid_current(),
+        },
+        # An identical row is left alone, so RETURNING comes back empty.
+        where=tuple_(models.User.name, models.User.badge_number).is_distinct_from(
+            tuple_(upsert.excluded.name, upsert.excluded.badge_number)
+        ),
+    ).returning(models.User.id)
+
+
+def user_id_statement(email: str):
+    return select(models.User.id).where(models.User.email == email)
+
+
+def user_role_ids_statement(user_id: UUID):
+    return select(models.user_role.c.role_id).where(
+        models.user_role.c.user_id == user_id
+    )
+
+
+def touch_user_statement(user_id: UUID):
+    # user_role changes reach the change feed through the user's version.
+    return (
+        update(models.User)
+        .where(models.User.id == user_id)
+        .values(version=func.txid_current())
+    )
+
+
+def replace_roles_statements(user_id: UUID, role_ids: list[UUID]):
+    yield delete(models.user_role).where(
+        models.user_role.c.user_id == user_id,
+        models.user_role.c.role_id.not_in(role_ids),
     )
-    for role_id in user.roles:
-        db_role = get_role_by_id(db=db, role_id=role_id)
-        db_user.roles.append(db_role)
-    db.add(db_user)
+    if role_ids:
+        yield (
+            pg_insert(models.user_role)
+            .values([{"user_id": user_id, "role_id": role_id} for role_id in role_ids])
+            .on_conflict_do_nothing()
+        )
+
+
+def upsert_user(db: Session, user: schemas.UserCreate):
+    """Create or overwrite the user with this email.
+
+    Repeating it is a no-op: an unchanged row and role set are not written,
+    so the user's version, the ETags and the change feed stay put.
+    """
+    role_ids = list(dict.fromkeys(user.roles))
+    user_id = db.execute(upsert_user_statements(user)).scalar()
+    changed = user_id is not None
+    if not changed:
+        user_id = db.execute(user_id_statement(user.email)).scalar_one()
+    if set(db.scalars(user_role_ids_statement(user_id))) != set(role_ids):
+        for statement in replace_roles_statements(user_id, role_ids):
+            db.execute(statement)
+        if not changed:
+            db.execute(touch_user_statement(user_id))
+        changed = True
     db.commit()
-    db.refresh(db_user)
-    return db_user
+    if changed:
+        auth.forget_users([user.email], [user_id])
+    roles.missing_role_ids(db, user.roles)
+    return user_snapshot(user_id, user)
+
+
+def _insert_users(db: Session, rows: list[tuple[int, UUID, schemas.UserCreate]]):
+    db.execute(
+        insert(models.User),
+        [
+            {
+                "id": user_id,
+                "name": user.name,
+                "email": user.email,
+                "badge_number": user.badge_number,
+            }
+            for _, user_id, user in rows
+        ],
+    )
+    links = [
+        {"user_id": user_id, "role_id": role_id}
+        for _, user_id, user in rows
+        for role_id in dict.fromkeys(user.roles)
+    ]
+    if links:
+        db.execute(insert(models.user_role), links)
+
+
+def bulk_create_users(db: Session, rows: list[tuple[int, schemas.UserCreate]]):
+    """Validate and insert one import batch; returns (created, errors).
+
+    Uniqueness and role existence are checked with one IN query each, then all
+    accepted users and their user_role rows go out as multi-row INSERTs.
+    """
+    errors = []
+    emails = {user.email for _, user in rows}
+    badge_numbers = {user.badge_number for _, user in rows}
+    role_ids = {role_id for _, user in rows for role_id in user.roles}
+    taken_emails = set(
+        db.scalars(select(models.User.email).where(models.User.email.in_(emails)))
+    )
+    taken_badge_numbers = set(
+        db.scalars(
+            select(models.User.badge_number).where(
+                models.User.badge_number.in_(badge_numbers)
+            )
+        )
+    )
+    known_role_ids = (
+        set(db.scalars(select(models.Role.id).where(models.Role.id.in_(role_ids))))
+        if role_ids
+        else set()
+    )
+
+    accepted = []
+    for line, user in rows:
+        missing_role = next((r for r in user.roles if r not in known_role_ids), None)
+        if user.email in taken_emails:
+            error = "Email already registered"
+        elif user.badge_number in taken_badge_numbers:
+            error = "Badge number already registered"
+        elif missing_role is not None:
+            error = f"Role with id {missing_role} does not exist"
+        else:
+            taken_emails.add(user.email)
+            taken_badge_numbers.add(user.badge_number)
+            accepted.append((line, uuid.uuid4(), user))
+            continue
+        errors.append(schemas.UserImportError(line=line, email=user.email, error=error))
+
+    try:
+        if accepted:
+            _insert_users(db, accepted)
+        db.commit()
+    except IntegrityError:
+        # A concurrent writer claimed an email or badge after our checks; fall
+        # back to row-at-a-time savepoints so only the conflicting rows fail.
+        db.rollback()
+        inserted = []
+        for row in accepted:
+            try:
+                with db.begin_nested():
+                    _insert_users(db, [row])
+            except IntegrityError as exc:
+                errors.append(
+                    schemas.UserImportError(
+                        line=row[0],
+                        email=row[2].email,
+                        error=integrity_error_detail(exc),
+                    )
+                )
+            else:
+                inserted.append(row)
+        db.commit()
+        accepted = inserted
+
+    auth.forget_users(
+        [user.email for _, _, user in accepted], [user_id for _, user_id, _ in accepted]
+    )
+    return len(accepted), errors
+
+
+def _users_with_roles(db: Session):
+    # Roles for the whole result set come from one IN-batched query instead
+    # of one lazy user_role load per serialized user.
+    return db.query(models.User).options(selectinload(models.User.roles))
 
 
 def get_user_by_id(db: Session, user_id: str):
-    return db.query(models.User).filter(models.User.id == user_id).first()
+    return _users_with_roles(db).filter(models.User.id == user_id).first()
 
 
 def get_user_by_email(db: Session, email: str):
-    return db.query(models.User).filter(models.User.email == email).first()
+    return _users_with_roles(db).filter(models.User.email == email).first()
 
 
 def get_user_by_badge_number(db: Session, badge_number: str):
     return (
-        db.query(models.User).filter(models.User.badge_number == badge_number).first()
+        _users_with_roles(db).filter(models.User.badge_number == badge_number).first()
     )
 
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.User).offset(skip).limit(limit).all()
+def get_users(db: Session, skip: int = 0, limit: int = 100, after: UUID | None = None):
+    query = _users_with_roles(db).order_by(models.User.id)
+    if after is not None:
+        return query.filter(models.User.id > after).limit(limit).all()
+    return query.offset(skip).limit(limit).all()
+
 
+USER_COLUMNS = (
+    models.User.id,
+    models.User.name,
+    models.User.email,
+    models.User.badge_number,
+)
+# Each is backed by a unique index: users_pkey, ix_users_email and
+# users_badge_number_key.
+USER_LOOKUP_COLUMNS = {
+    "id": models.User.id,
+    "email": models.User.email,
+    "badge_number": models.User.badge_number,
+}
 
-# def create_employee(db: Session, employee: schemas.EmployeeBase, current_user):
-#     db_employee = models.Employee(
-#         user_id=current_user.id,
-#         avatar_url=employee.avatar_url,
-#         phone=employee.phone,
-#         job_position=employee.job_position,
-#         department=employee.department,
-#         work_location=employee.work_location,
-#         summary=employee.summary,
-#     )
-#     for manager_id in employee.managers:
-#         db_manager = db.query(models.User).filter(models.User.id == manager_id).first()
-#         db_employee.managers.append(db_manager)
-#     db.add(db_employee)
-#     db.commit()
-#     db.refresh(db_employee)
-#     return db_employee
 
+# Field names accepted by ``fields=`` on /users/, in response order. "id" is
+# always sent (cursors are built from it) and "roles" costs a second query.
+USER_FIELDS = ("name", "email", "badge_number", "id", "roles")
+
+
+def parse_user_fields(fields: str | None):
+    """``"name,roles"`` -> ``("name", "id", "roles")``; None means every field."""
+    if fields is None:
+        return None
+    requested = {field.strip() for field in fields.split(",")} - {""}
+    unknown = requested.difference(USER_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+        )
+    requested.add("id")
+    return tuple(field for field in USER_FIELDS if field in requested)
+
+
+def user_rows_statement(
+    skip: int = 0,
+    limit: int = 100,
+    after: UUID | None = None,
+    fields: tuple[str, ...] | None = None,
+):
+    columns = USER_COLUMNS
+    if fields is not None:
+        columns = [getattr(models.User, field) for field in fields if field != "roles"]
+    query = select(*columns).order_by(models.User.id)
+    if after is not None:
+        query = query.where(models.User.id > after)
+    else:
+        query = query.offset(skip)
+    return query.limit(limit)
+
+
+def user_role_links_statement(user_ids: list[UUID]):
+    return select(models.user_role.c.user_id, models.user_role.c.role_id).where(
+        models.user_role.c.user_id.in_(user_ids)
+    )
 
-# def get_employees(db: Session, skip: int = 0, limit: int = 100):
-#     return db.query(models.Employee).offset(skip).limit(limit).all()
 
+def get_user_dicts(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    after: UUID | None = None,
+    fields: tuple[str, ...] | None = None,
+):
+    """get_users as plain response dicts: column tuples plus role ids resolved
+    through the role catalog, with no ORM objects or per-row validation.
+    ``fields`` (see parse_user_fields) narrows both the SELECT and the dicts."""
+    rows = db.execute(user_rows_statement(skip, limit, after, fields)).all()
+    if not rows:
+        return []
+    if fields is not None and "roles" not in fields:
+        return serializers.user_dicts(rows, fields=fields)
+    links = db.execute(user_role_links_statement([row.id for row in rows])).all()
+    catalog = roles.ensure_cached(db, {role_id for _, role_id in links})
+    return serializers.user_dicts(rows, links, catalog, fields)
 
-# def get_employee_by_user_id(db: Session, user_id: str):
-#     return db.query(models.Employee).filter(models.Employee.user_id == user_id).first()
 
+USER_BATCH_MAX = int(os.getenv("USER_BATCH_MAX", 500))
 
-# def get_employee_by_id(db: Session, employee_id: str):
-#     return db.query(models.Employee).filter(models.Employee.id == employee_id).first()
 
+def batch_lookup_keys(lookup: schemas.UserBatchLookup):
+    """Map each key in its column's form to the key as the client sent it."""
+    if len(lookup.keys) > USER_BATCH_MAX:
+        raise HTTPException(
+            status_code=400, detail=f"At most {USER_BATCH_MAX} keys per request"
+        )
+    if lookup.by != "id":
+        return {key: key for key in lookup.keys}
+    keys = {}
+    for key in lookup.keys:
+        try:
+            keys[UUID(key)] = key
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid user id {key}")
+    return keys
 
-# def patch_employee(db: Session, employee_id: str, employee: schemas.EmployeeCreate):
-#     db_employee = db.query(models.Employee).filter(models.Employee.id == employee_id)
-#     if "managers" in employee.dict(exclude_none=True).keys():
-#         # TODO: Add logic to patch managers
-#         raise HTTPException(
-#             status_code=401,
-#             detail="Cannot patch managers",
-#         )
-#     else:
-#         db_employee.update(employee.dict(exclude_none=True))
-#         db.commit()
-#         return db_employee.first()
+
+def batch_lookup_result(by: str, keys: dict, users: list[dict]):
+    found = {keys[user[by]]: user for user in users}
+    return {
+        "found": found,
+        "missing": [key for key in keys.values() if key not in found],
+    }
+
+
+def user_lookup_statement(by: str, keys: list):
+    return select(*USER_COLUMNS).where(USER_LOOKUP_COLUMNS[by].in_(keys))
+
+
+def get_user_dicts_by(db: Session, by: str, keys: list):
+    """Users whose ``by`` column is in ``keys`` (one IN query plus one for
+    roles), as response dicts."""
+    rows = db.execute(user_lookup_statement(by, keys)).all()
+    if not rows:
+        return []
+    links = db.execute(user_role_links_statement([row.id for row in rows])).all()
+    catalog = roles.ensure_cached(db, {role_id for _, role_id in links})
+    return serializers.user_dicts(rows, links, catalog)
+
+
+def get_user_changes(db: Session, since: tuple[int, UUID] | None, limit: int):
+    rows = db.execute(changes.changes_statement(since, limit)).all()
+    user_ids = changes.live_ids(rows, "user")
+    users = get_user_dicts_by(db, "id", user_ids) if user_ids else []
+    catalog = roles.ensure_cached(db, changes.live_ids(rows, "role"))
+    return changes.feed(rows, users, catalog, since, limit)
+
+
+# Same expression as the ix_users_search_trgm index (alembic revision 0002);
+# written out literally so the planner can match it.
+USER_SEARCH_TEXT = literal_column(
+    "(users.name || ' ' || users.email || ' ' || users.badge_number)", String
+)
+
+
+def search_users_statement(q: str, limit: int):
+    """Users whose name, email or badge contains words similar to ``q``.
+
+    Ranked by pg_trgm word-similarity distance, which the GiST index can
+    return in order, so the LIMIT bounds the work.
+    """
+    term = literal(q, String)
+    distance = term.op("<<->", return_type=Float)(USER_SEARCH_TEXT)
+    return (
+        select(models.User)
+        .options(selectinload(models.User.roles))
+        .where(term.op("<%", is_comparison=True)(USER_SEARCH_TEXT))
+        .order_by(distance, models.User.name)
+        .limit(limit)
+    )
+
+
+def search_users(db: Session, q: str, limit: int = 20):
+    return db.scalars(search_users_statement(q, limit)).all()
+
+
+def missing_user_ids(db: Session, user_ids: list[UUID]):
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return []
+    found = set(db.scalars(select(models.User.id).where(models.User.id.in_(user_ids))))
+    return [user_id for user_id in user_ids if user_id not in found]
+
+
+def _set_managers(db: Session, db_employee: models.Employee, manager_ids: list[UUID]):
+    """Replace the employee's managers and refresh the org-chart closure.
+
+    Raises hierarchy.ManagerCycleError if the change would close a loop.
+    """
+    manager_ids = list(dict.fromkeys(manager_ids))
+    hierarchy.lock(db)
+    hierarchy.check_managers(db, db_employee.user_id, manager_ids)
+    db.execute(
+        delete(models.employee_manager).where(
+            models.employee_manager.c.employee_id == db_employee.id
+        )
+    )
+    if manager_ids:
+        db.execute(
+            insert(models.employee_manager),
+            [
+                {"employee_id": db_employee.id, "manager_id": manager_id}
+                for manager_id in manager_ids
+            ],
+        )
+    hierarchy.rebuild(db, db_employee.user_id)
+
+
+def create_employee(db: Session, employee: schemas.EmployeeCreate, current_user):
+    db_employee = models.Employee(
+        user_id=current_user.id,
+        avatar_url=employee.avatar_url,
+        phone=employee.phone,
+        job_position=employee.job_position,
+        department=employee.department,
+        work_location=employee.work_location,
+        summary=employee.summary,
+    )
+    db.add(db_employee)
+    db.flush()
+    _set_managers(db, db_employee, employee.managers)
+    db.commit()
+    db.refresh(db_employee)
+    return db_employee
+
+
+def _employees_with_managers(db: Session):
+    return db.query(models.Employee).options(
+        selectinload(models.Employee.managers).selectinload(models.User.roles)
+    )
+
+
+def get_employees(db: Session, skip: int = 0, limit: int = 100):
+    return (
+        _employees_with_managers(db)
+        .order_by(models.Employee.id)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+
+def get_employee_by_user_id(db: Session, user_id: str):
+    return db.query(models.Employee).filter(models.Employee.user_id == user_id).first()
+
+
+def get_employee_by_id(db: Session, employee_id: str):
+    return db.query(models.Employee).filter(models.Employee.id == employee_id).first()
+
+
+def patch_employee(
+    db: Session, db_employee: models.Employee, employee: schemas.EmployeeCreate
+):
+    changes = employee.model_dump(exclude_unset=True)
+    manager_ids = changes.pop("managers", None)
+    for field, value in changes.items():
+        setattr(db_employee, field, value)
+    if manager_ids is not None:
+        db.flush()
+        _set_managers(db, db_employee, manager_ids)
+    db.commit()
+    db.refresh(db_employee)
+    return db_employee
+
+
+def get_reports(
+    db: Session,
+    user_id: UUID,
+    max_depth: int | None = None,
+    skip: int = 0,
+    limit: int = 100,
+):
+    """Everyone below ``user_id`` in the org chart, nearest first."""
+    statement = hierarchy.reports_statement(user_id, max_depth)
+    return db.execute(statement.offset(skip).limit(limit)).all()
+
+
+def get_managers(db: Session, user_id: UUID):
+    """The management chain above ``user_id``, direct managers first."""
+    return db.execute(hierarchy.managers_statement(user_id)).all()
+
+
+def get_employees_by_ids(db: Session, employee_ids: list[UUID]):
+    """Employees in the order of ``employee_ids``."""
+    if not employee_ids:
+        return []
+    by_id = {
+        employee.id: employee
+        for employee in _employees_with_managers(db).filter(
+            models.Employee.id.in_(employee_ids)
+        )
+    }
+    return [by_id[employee_id] for employee_id in employee_ids if employee_id in by_id]
+
+
+def create_skill(db: Session, facet: str, skill: schemas.SkillCreate):
+    model, name_column, _ = skills.FACETS[facet]
+    db_skill = model(**{name_column.key: skill.name})
+    db.add(db_skill)
+    db.commit()
+    skills.skill_index.add_skill(facet, db_skill.id, skill.name)
+    return schemas.Skill(id=db_skill.id, name=skill.name)
+
+
+def create_experience(
+    db: Session, employee_id: UUID, experience: schemas.ExperienceCreate
+):
+    """Raise IntegrityError when a project references an unknown skill."""
+    db_experience = models.Experience(
+        employee_id=employee_id, **experience.model_dump(exclude={"projects"})
+    )
+    db_projects = [
+        models.ExperienceProject(
+            experience=db_experience,
+            **project.model_dump(
+                exclude={"programming_languages", "frameworks", "servers"}
+            ),
+        )
+        for project in experience.projects
+    ]
+    db.add(db_experience)
+    db.flush()
+    for field, (_, _, skill_column) in zip(
+        ("programming_languages", "frameworks", "servers"), skills.FACETS.values()
+    ):
+        links = [
+            {"experience_project_id": db_project.id, skill_column.key: skill_id}
+            for project, db_project in zip(experience.projects, db_projects)
+            for skill_id in dict.fromkeys(getattr(project, field))
+        ]
+        if links:
+            db.execute(insert(skill_column.table), links)
+    db.commit()
+    skills.refresh_employee(db, employee_id)
+    return (
+        db.query(models.Experience)
+        .options(
+            selectinload(models.Experience.projects).selectinload(
+                models.ExperienceProject.programming_languages
+            ),
+            selectinload(models.Experience.projects).selectinload(
+                models.ExperienceProject.frameworks
+            ),
+            selectinload(models.Experience.projects).selectinload(
+                models.ExperienceProject.servers
+            ),
+        )
+        .filter(models.Experience.id == db_experience.id)
+        .one()
+    )
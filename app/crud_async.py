@@ -0,0 +1,100 @@
+from uuid import UUID
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from . import models
+from . import schemas
+from . import auth
+from . import changes
+from . import crud
+from . import roles
+from . import serializers
+
+
+async def create_role(db: AsyncSession, role: schemas.RoleBase):
+    db_role = models.Role(role=role.role)
+    db.add(db_role)
+    await db.commit()
+    roles.role_cache.add(db_role)
+    return db_role
+
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    user_id = (await db.execute(crud.create_user_statement(user))).scalars().first()
+    await db.commit()
+    auth.forget_users([user.email], [user_id])
+    await roles.missing_role_ids_async(db, user.roles)
+    return crud.user_snapshot(user_id, user)
+
+
+async def upsert_user(db: AsyncSession, user: schemas.UserCreate):
+    role_ids = list(dict.fromkeys(user.roles))
+    user_id = (await db.execute(crud.upsert_user_statements(user))).scalar()
+    changed = user_id is not None
+    if not changed:
+        user_id = (await db.execute(crud.user_id_statement(user.email))).scalar_one()
+    if set(await db.scalars(crud.user_role_ids_statement(user_id))) != set(role_ids):
+        for statement in crud.replace_roles_statements(user_id, role_ids):
+            await db.execute(statement)
+        if not changed:
+            await db.execute(crud.touch_user_statement(user_id))
+        changed = True
+    await db.commit()
+    if changed:
+        auth.forget_users([user.email], [user_id])
+    await roles.missing_role_ids_async(db, user.roles)
+    return crud.user_snapshot(user_id, user)
+
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    return await db.scalar(
+        select(models.User)
+        .options(selectinload(models.User.roles))
+        .where(models.User.email == email)
+    )
+
+
+async def get_user_dicts(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after: UUID | None = None,
+    fields: tuple[str, ...] | None = None,
+):
+    rows = (
+        await db.execute(crud.user_rows_statement(skip, limit, after, fields))
+    ).all()
+    if not rows:
+        return []
+    if fields is not None and "roles" not in fields:
+        return serializers.user_dicts(rows, fields=fields)
+    links = (
+        await db.execute(crud.user_role_links_statement([row.id for row in rows]))
+    ).all()
+    catalog = await roles.ensure_cached_async(db, {role_id for _, role_id in links})
+    return serializers.user_dicts(rows, links, catalog, fields)
+
+
+async def get_user_dicts_by(db: AsyncSession, by: str, keys: list):
+    rows = (await db.execute(crud.user_lookup_statement(by, keys))).all()
+    if not rows:
+        return []
+    links = (
+        await db.execute(crud.user_role_links_statement([row.id for row in rows]))
+    ).all()
+    catalog = await roles.ensure_cached_async(db, {role_id for _, role_id in links})
+    return serializers.user_dicts(rows, links, catalog)
+
+
+async def get_user_changes(
+    db: AsyncSession, since: tuple[int, UUID] | None, limit: int
+):
+    rows = (await db.execute(changes.changes_statement(since, limit))).all()
+    user_ids = changes.live_ids(rows, "user")
+    users = await get_user_dicts_by(db, "id", user_ids) if user_ids else []
+    catalog = await roles.ensure_cached_async(db, changes.live_ids(rows, "role"))
+    return changes.feed(rows, users, catalog, since, limit)
+
+
+async def search_users(db: AsyncSession, q: str, limit: int = 20):
+    return (await db.scalars(crud.search_users_statement(q, limit))).all()
@@ -1,21 +1,183 @@
 import os
+from contextlib import asynccontextmanager, contextmanager
 from dotenv import load_dotenv
-from fastapi import Request
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from . import metrics
+from .pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool
+from .replicas import ReplicaSession, ReplicaSet
 
 
 load_dotenv()
 SQLALCHEMY_DATABASE_URL = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASS')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+POOL_OPTIONS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+    # Recycle connections before server/proxy idle timeouts and ping them on
+    # checkout so a failover does not surface stale-connection errors.
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower()
+    in ("1", "true", "yes"),
+}
+
+engine = metrics.instrument_engine(
+    create_engine(
+        SQLALCHEMY_DATABASE_URL, poolclass=InstrumentedQueuePool, **POOL_OPTIONS
+    )
+)
 
 Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Optional read replicas as host[:port] pairs, sharing the primary's user,
+# password and database name. GET endpoints read from them round-robin and
+# fall back to a read-only primary session when none is reachable.
+DB_REPLICA_HOSTS = [
+    host.strip()
+    for host in os.getenv("DB_REPLICA_HOSTS", "").split(",")
+    if host.strip()
+]
+DB_REPLICA_RETRY_AFTER = float(os.getenv("DB_REPLICA_RETRY_AFTER", 30))
+
+
+def _replica_url(scheme: str, replica: str):
+    host, _, port = replica.partition(":")
+    return f"{scheme}://{os.getenv('DB_USER')}:{os.getenv('DB_PASS')}@{host}:{port or os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+
+
+readonly_engine = engine.execution_options(postgresql_readonly=True)
+
+replicas = ReplicaSet(
+    {
+        host: metrics.instrument_engine(
+            create_engine(
+                _replica_url("postgresql", host),
+                poolclass=InstrumentedQueuePool,
+                **POOL_OPTIONS,
+            ),
+            name=host,
+        ).execution_options(postgresql_readonly=True)
+        for host in DB_REPLICA_HOSTS
+    },
+    retry_after=DB_REPLICA_RETRY_AFTER,
+)
+
+# DB_ASYNC=true serves the core endpoints from an asyncpg-backed AsyncSession
+# instead of threadpool workers. The sync engine stays available either way.
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes")
+ASYNC_SQLALCHEMY_DATABASE_URL = f"postgresql+asyncpg://{os.getenv('DB_USER')}:{os.getenv('DB_PASS')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+
+async_engine = (
+    create_async_engine(
+        ASYNC_SQLALCHEMY_DATABASE_URL,
+        poolclass=InstrumentedAsyncQueuePool,
+        **POOL_OPTIONS,
+    )
+    if DB_ASYNC
+    else None
+)
+
+if async_engine is not None:
+    metrics.instrument_engine(async_engine.sync_engine, name="async")
+
+async_readonly_engine = (
+    async_engine.execution_options(postgresql_readonly=True) if DB_ASYNC else None
+)
+
+
+def _async_replica_engine(host: str):
+    replica = create_async_engine(
+        _replica_url("postgresql+asyncpg", host),
+        poolclass=InstrumentedAsyncQueuePool,
+        **POOL_OPTIONS,
+    )
+    metrics.instrument_engine(replica.sync_engine, name=host)
+    return replica.execution_options(postgresql_readonly=True)
+
+
+async_replicas = ReplicaSet(
+    {
+        host: _async_replica_engine(host)
+        for host in (DB_REPLICA_HOSTS if DB_ASYNC else [])
+    },
+    retry_after=DB_REPLICA_RETRY_AFTER,
+)
+
+AsyncSession = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
+ReadSession = sessionmaker(
+    class_=ReplicaSession,
+    autoflush=False,
+    replicas=replicas,
+    fallback=readonly_engine,
+)
+AsyncReadSession = async_sessionmaker(
+    sync_session_class=ReplicaSession,
+    autoflush=False,
+    expire_on_commit=False,
+    replicas=async_replicas,
+    fallback=async_readonly_engine.sync_engine if DB_ASYNC else None,
+)
+
 Base = declarative_base()
 
 
 # Dependency
-def get_db(request: Request):
-    return request.state.db
+def get_db():
+    # Only requests that resolve this dependency open a session, and the
+    # session itself only checks out a connection on its first statement.
+    db = Session()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    db = AsyncSession()
+    try:
+        yield db
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
+
+
+@contextmanager
+def read_session():
+    """Session for read-only work, bound to a replica when one is reachable."""
+    db = ReadSession()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@asynccontextmanager
+async def async_read_session():
+    db = AsyncReadSession()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+def get_read_db():
+    with read_session() as db:
+        yield db
+
+
+async def get_async_read_db():
+    async with async_read_session() as db:
+        yield db
@@ -0,0 +1,103 @@
+import hashlib
+import os
+
+from fastapi import Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import changes
+from . import roles
+from .cache import MISSING, TTLCache
+from .database import get_async_read_db, get_read_db
+
+# Encoded list bodies are kept this long under their ETag; 0 disables.
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 5))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 256))
+
+response_cache = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+
+
+# Version dependencies: each returns a string that changes whenever the
+# collection does and is the same on every worker. They share the request's
+# read session with the endpoint, so a tag never describes newer data than
+# the replica the body is read from.
+
+
+def users_version(db: Session = Depends(get_read_db)):
+    return changes.state_token(*db.execute(changes.users_state_statement()).one())
+
+
+async def users_version_async(db: AsyncSession = Depends(get_async_read_db)):
+    row = (await db.execute(changes.users_state_statement())).one()
+    return changes.state_token(*row)
+
+
+def roles_version(db: Session = Depends(get_read_db)):
+    # GET /roles/ is served from the role cache, so its tag follows the cache.
+    return roles.current(db).fingerprint
+
+
+async def roles_version_async(db: AsyncSession = Depends(get_async_read_db)):
+    return (await roles.current_async(db)).fingerprint
+
+
+def compute_etag(collection: str, version: str, query_params):
+    query = sorted(query_params.multi_items())
+    raw = f"{collection}:{version}:{query}"
+    # Weak: the same representation may be sent with different encodings.
+    return f'W/"{hashlib.blake2b(raw.encode(), digest_size=12).hexdigest()}"'
+
+
+def _matches(if_none_match: str | None, etag: str):
+    if not if_none_match:
+        return False
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate == "*" or candidate.removeprefix("W/") == opaque
+        for candidate in (value.strip() for value in if_none_match.split(","))
+    )
+
+
+class CachedResponse(Exception):
+    """Raised by :func:`conditional` to answer before the endpoint runs."""
+
+    def __init__(self, response: Response):
+        self.response = response
+
+
+async def cached_response_handler(request: Request, exc: CachedResponse):
+    return exc.response
+
+
+def conditional(collection: str, version):
+    """Dependency answering ``If-None-Match`` and cached bodies for ``collection``.
+
+    ``version`` is one of the version dependencies above. Declare this ahead
+    of the endpoint's own work so that a 304 or a cached body costs only the
+    version lookup.
+    """
+
+    async def dependency(
+        request: Request, response: Response, state: str = Depends(version)
+    ) -> str:
+        etag = compute_etag(collection, state, request.query_params)
+        if _matches(request.headers.get("if-none-match"), etag):
+            raise CachedResponse(Response(status_code=304, headers={"ETag": etag}))
+        cached = response_cache.get(etag)
+        if cached is not MISSING:
+            body, headers = cached
+            raise CachedResponse(
+                Response(body, media_type="application/json", headers=headers)
+            )
+        response.headers["ETag"] = etag
+        return etag
+
+    return dependency
+
+
+def render(etag: str, response: Response, body: bytes):
+    """Send the encoded ``body`` and remember it under ``etag``."""
+    headers = dict(response.headers)
+    if RESPONSE_CACHE_TTL > 0:
+        response_cache.set(etag, (body, headers))
+    return Response(body, media_type="application/json", headers=headers)
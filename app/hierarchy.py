@@ -0,0 +1,112 @@
+from uuid import UUID
+
+from sqlalchemy import any_, bindparam, delete, func, insert, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import Session, selectinload
+
+from . import models
+
+# Key for pg_advisory_xact_lock: manager changes are serialized so that two
+# concurrent edits cannot each pass the cycle check and close a loop together.
+HIERARCHY_LOCK_KEY = 0x6F7267
+
+closure = models.user_hierarchy
+
+
+class ManagerCycleError(Exception):
+    def __init__(self, manager_id: UUID):
+        super().__init__(f"Manager with id {manager_id} reports to this employee")
+        self.manager_id = manager_id
+
+
+def lock(db: Session):
+    db.execute(select(func.pg_advisory_xact_lock(HIERARCHY_LOCK_KEY)))
+
+
+def check_managers(db: Session, user_id: UUID, manager_ids: list[UUID]):
+    """Raise ManagerCycleError if a manager is ``user_id`` or one of its reports."""
+    if user_id in manager_ids:
+        raise ManagerCycleError(user_id)
+    if not manager_ids:
+        return
+    report_id = db.scalar(
+        select(closure.c.descendant_id)
+        .where(
+            closure.c.ancestor_id == user_id,
+            closure.c.descendant_id.in_(manager_ids),
+        )
+        .limit(1)
+    )
+    if report_id is not None:
+        raise ManagerCycleError(report_id)
+
+
+def rebuild(db: Session, user_id: UUID):
+    """Recompute the closure rows of ``user_id`` and everyone below it.
+
+    Only that subtree's ancestors can change when its managers do; they are
+    re-derived from employee_manager with one recursive query.
+    """
+    affected = [
+        user_id,
+        *db.scalars(
+            select(closure.c.descendant_id).where(closure.c.ancestor_id == user_id)
+        ),
+    ]
+    ids = bindparam("ids", affected, type_=ARRAY(PG_UUID(as_uuid=True)))
+    db.execute(delete(closure).where(closure.c.descendant_id == any_(ids)))
+
+    employees = models.Employee.__table__
+    edges = employees.join(
+        models.employee_manager,
+        models.employee_manager.c.employee_id == employees.c.id,
+    )
+    up = (
+        select(
+            employees.c.user_id.label("descendant_id"),
+            models.employee_manager.c.manager_id.label("ancestor_id"),
+            literal(1).label("depth"),
+        )
+        .select_from(edges)
+        .where(employees.c.user_id == any_(ids))
+        .cte("up", recursive=True)
+    )
+    up = up.union(
+        select(
+            up.c.descendant_id,
+            models.employee_manager.c.manager_id,
+            up.c.depth + 1,
+        ).select_from(up.join(edges, employees.c.user_id == up.c.ancestor_id))
+    )
+    db.execute(
+        insert(closure).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(up.c.ancestor_id, up.c.descendant_id, func.min(up.c.depth)).group_by(
+                up.c.ancestor_id, up.c.descendant_id
+            ),
+        )
+    )
+
+
+def reports_statement(user_id: UUID, max_depth: int | None = None):
+    query = (
+        select(models.User, closure.c.depth)
+        .join(closure, closure.c.descendant_id == models.User.id)
+        .where(closure.c.ancestor_id == user_id)
+        .options(selectinload(models.User.roles))
+        .order_by(closure.c.depth, models.User.name)
+    )
+    if max_depth is not None:
+        query = query.where(closure.c.depth <= max_depth)
+    return query
+
+
+def managers_statement(user_id: UUID):
+    return (
+        select(models.User, closure.c.depth)
+        .join(closure, closure.c.ancestor_id == models.User.id)
+        .where(closure.c.descendant_id == user_id)
+        .options(selectinload(models.User.roles))
+        .order_by(closure.c.depth, models.User.name)
+    )
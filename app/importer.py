@@ -0,0 +1,165 @@
+import csv
+import json
+import os
+from collections import deque
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from . import crud
+from . import schemas
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+# Longest line, or CSV record spanning lines, an upload may contain.
+IMPORT_MAX_LINE = int(os.getenv("IMPORT_MAX_LINE", 65536))
+
+
+class _LineTooLong(Exception):
+    pass
+
+
+async def _iter_lines(stream, max_line: int = IMPORT_MAX_LINE):
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if len(line) > max_line:
+                raise _LineTooLong
+            yield line
+        if len(buffer) > max_line:
+            raise _LineTooLong
+    if buffer:
+        yield buffer
+
+
+def _describe(exc: Exception):
+    if isinstance(exc, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}"
+            for error in exc.errors()
+        )
+    return str(exc)
+
+
+def _ends_quoted(line: str, quoted: bool):
+    """Whether a quoted field is still open after ``line``, scanned the way
+    csv.reader reads it: a quote opens a field only as its first character,
+    and inside one ``""`` stands for a literal quote."""
+    state = "quoted" if quoted else "start"
+    for char in line:
+        if state == "field":
+            if char == ",":
+                state = "start"
+        elif state == "quoted":
+            if char == '"':
+                state = "quote"
+        else:
+            # At a field's start, or just past a quote inside a quoted field.
+            if char == '"':
+                state = "quoted"
+            elif char == ",":
+                state = "start"
+            else:
+                state = "field"
+    return state == "quoted"
+
+
+def _csv_row(header: list[str], values: list[str]):
+    if len(values) != len(header):
+        raise ValueError(f"Expected {len(header)} columns, got {len(values)}")
+    row = dict(zip(header, values))
+    # Role ids share one cell, separated by semicolons.
+    row["roles"] = [r.strip() for r in row.get("roles", "").split(";") if r.strip()]
+    return row
+
+
+async def import_users(
+    db: Session, stream, csv_format: bool, batch_size: int = IMPORT_BATCH_SIZE
+):
+    """Parse a JSONL or CSV upload incrementally and import it batch by batch.
+
+    Bad rows are reported by line number; they never abort the rest of the load.
+    A line (or CSV record) over IMPORT_MAX_LINE does: the rows before it are
+    still imported and the 413 reports them like a normal result.
+    """
+    result = schemas.UserImportResult()
+    header = None
+    batch = []
+
+    async def flush():
+        created, errors = await run_in_threadpool(crud.bulk_create_users, db, batch)
+        result.created += created
+        result.errors.extend(errors)
+        batch.clear()
+
+    # CSV goes through one csv.reader fed from ``pending``. Lines are queued
+    # while a quoted field is open, so such a field may span lines and the
+    # reader is only asked for a record once all of it has arrived.
+    pending = deque()
+    reader = csv.reader(iter(pending.popleft, None))
+    record_start = record_size = 0
+
+    line_number = 0
+    try:
+        async for raw in _iter_lines(stream, IMPORT_MAX_LINE):
+            line_number += 1
+            if not pending:
+                record_start, record_size = line_number, 0
+            try:
+                line = raw.decode("utf-8-sig" if line_number == 1 else "utf-8")
+                if csv_format:
+                    if not pending and not line.strip():
+                        continue
+                    pending.append(line + "\n")
+                    record_size += len(raw) + 1
+                    if _ends_quoted(line, quoted=len(pending) > 1):
+                        if record_size > IMPORT_MAX_LINE:
+                            raise _LineTooLong
+                        continue
+                    values = next(reader)
+                    if header is None:
+                        header = [column.strip() for column in values]
+                        continue
+                    data = _csv_row(header, values)
+                else:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                batch.append((record_start, schemas.UserCreate.model_validate(data)))
+            except (ValueError, csv.Error) as exc:
+                pending.clear()
+                result.errors.append(
+                    schemas.UserImportError(line=record_start, error=_describe(exc))
+                )
+            if len(batch) >= batch_size:
+                await flush()
+    except _LineTooLong:
+        # Earlier batches are committed already; finish the rows before the
+        # long line too, so the client learns exactly where the import stopped.
+        too_long = record_start if pending else line_number + 1
+        if batch:
+            await flush()
+        result.errors.sort(key=lambda error: error.line)
+        raise HTTPException(
+            status_code=413,
+            detail={
+                "error": f"Line {too_long} is longer than {IMPORT_MAX_LINE} bytes;"
+                " it and the rest of the upload were not imported",
+                **result.model_dump(mode="json"),
+            },
+        )
+    if pending:
+        result.errors.append(
+            schemas.UserImportError(
+                line=record_start, error="Quoted field is never closed"
+            )
+        )
+    if batch:
+        await flush()
+
+    result.errors.sort(key=lambda error: error.line)
+    return result
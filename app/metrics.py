@@ -0,0 +1,234 @@
+import bisect
+import threading
+import time
+
+from sqlalchemy import event
+
+from . import profiler
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: dict = {}
+        self._lock = threading.Lock()
+
+    def _header(self):
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(
+                f"{self.name}{_format_labels(self.label_names, labels)} {value}"
+            )
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labels, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then sum and count.
+                state = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            values = sorted(
+                (labels, (list(counts), total, count))
+                for labels, (counts, total, count) in self._values.items()
+            )
+        for labels, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = _format_labels(self.label_names, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _format_labels(self.label_names, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {count}")
+            label_str = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_str} {total}")
+            lines.append(f"{self.name}_count{label_str} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[_Metric] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(
+    Counter(
+        "http_requests_total",
+        "HTTP requests by route template and status.",
+        ("method", "route", "status"),
+    )
+)
+http_request_duration = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "HTTP request latency by route template.",
+        ("method", "route"),
+    )
+)
+http_requests_in_progress = registry.register(
+    Gauge("http_requests_in_progress", "HTTP requests being served.", ("method",))
+)
+db_statements = registry.register(
+    Counter(
+        "db_statements_total",
+        "SQL statements sent to the database.",
+        ("engine", "operation"),
+    )
+)
+db_statement_duration = registry.register(
+    Histogram(
+        "db_statement_duration_seconds",
+        "SQL statement execution time.",
+        ("engine", "operation"),
+    )
+)
+startup_duration = registry.register(
+    Gauge(
+        "app_startup_seconds",
+        "Worker cold start: importing main and running the lifespan startup.",
+        ("phase",),
+    )
+)
+zoho_request_duration = registry.register(
+    Histogram(
+        "zoho_request_duration_seconds",
+        "Outbound Zoho /oauth/user/info latency by response status.",
+        ("status",),
+    )
+)
+admission_rejections = registry.register(
+    Counter(
+        "http_admission_rejections_total",
+        "Requests turned away by admission control (429 or 503).",
+        ("route_class", "reason"),
+    )
+)
+
+
+def _operation(statement: str):
+    word = statement.lstrip().split(None, 1)
+    return word[0].upper() if word else ""
+
+
+def instrument_engine(engine, name: str = "primary"):
+    """Time every statement ``engine`` executes; returns the engine."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        context._metrics_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        elapsed = time.perf_counter() - context._metrics_start
+        operation = _operation(statement)
+        db_statements.inc(name, operation)
+        db_statement_duration.observe(name, operation, value=elapsed)
+        profiler.record(conn, cursor, statement, parameters, many, name, elapsed)
+
+    return engine
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording per-route latency, status and in-flight."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_progress.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_requests_in_progress.dec(method)
+            # The route template keeps label cardinality bounded; anything
+            # that did not match a route is folded into one series.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_requests.inc(method, route, str(status))
+            http_request_duration.observe(method, route, value=elapsed)
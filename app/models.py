@@ -1,7 +1,20 @@
 from __future__ import annotations
 import uuid
 from typing import List
-from sqlalchemy import Column, ForeignKey, Integer, String, Text, Date, Table
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Date,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Table,
+    Text,
+    func,
+    text,
+)
 from sqlalchemy.orm import relationship, Mapped
 from sqlalchemy.dialects.postgresql import UUID
 from .database import Base
@@ -15,23 +28,44 @@ user_role = Table(
 )
 
 
+# Change-feed version: the id of the last transaction that wrote the row.
+# Set on insert by the server default and on update by the write paths in
+# crud; see app.changes for why transaction ids rather than a sequence.
+def version_column(name: str = "version"):
+    return Column(
+        name, BigInteger, nullable=False, server_default=text("txid_current()")
+    )
+
+
 class Role(Base):
     __tablename__ = "roles"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     role = Column(String, unique=True, nullable=False)
+    version = version_column()
 
     users: Mapped[List[User]] = relationship(
         secondary=user_role, back_populates="roles"
     )
 
 
-# employee_manager = Table(
-#     "employee_manager",
-#     Base.metadata,
-#     Column("employee_id", ForeignKey("employees.id"), primary_key=True),
-#     Column("manager_id", ForeignKey("users.id"), primary_key=True),
-# )
+employee_manager = Table(
+    "employee_manager",
+    Base.metadata,
+    Column("employee_id", ForeignKey("employees.id"), primary_key=True),
+    Column("manager_id", ForeignKey("users.id"), primary_key=True, index=True),
+)
+
+# Closure of employee_manager over users: one row per (manager, report) pair
+# at any distance, maintained by app.hierarchy whenever managers change.
+user_hierarchy = Table(
+    "user_hierarchy",
+    Base.metadata,
+    Column("ancestor_id", ForeignKey("users.id"), primary_key=True),
+    Column("descendant_id", ForeignKey("users.id"), primary_key=True),
+    Column("depth", Integer, nullable=False),
+    Index("ix_user_hierarchy_descendant_depth", "descendant_id", "depth"),
+)
 
 
 class User(Base):
@@ -41,136 +75,158 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     name = Column(String, nullable=False)
     badge_number = Column(String, unique=True, nullable=False)
+    # Also bumped when the user's roles change; the feed pages by (version, id).
+    version = version_column()
+
+    __table_args__ = (Index("ix_users_version_id", "version", "id"),)
 
-    # employee = relationship("Employee")
+    employee = relationship("Employee")
 
     roles: Mapped[List[Role]] = relationship(
         secondary=user_role, back_populates="users"
     )
-    # employees: Mapped[List[Employee]] = relationship(
-    #     secondary=employee_manager, back_populates="managers"
-    # )
+    employees: Mapped[List[Employee]] = relationship(
+        secondary=employee_manager, back_populates="managers"
+    )
 
 
-# class Employee(Base):
-#     __tablename__ = "employees"
+# Deleted users and roles, for the change feed. Rows are written by AFTER
+# DELETE triggers (alembic revision 0005) so every delete path is covered.
+tombstones = Table(
+    "tombstones",
+    Base.metadata,
+    Column("entity", String, primary_key=True),
+    Column("entity_id", UUID(as_uuid=True), primary_key=True),
+    version_column(),
+    Column(
+        "deleted_at", DateTime(timezone=True), nullable=False, server_default=func.now()
+    ),
+    Index("ix_tombstones_version_id", "version", "entity_id"),
+)
 
-#     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-#     user_id = Column(UUID, ForeignKey("users.id"), unique=True, nullable=False)
-#     avatar_url = Column(String)
-#     phone = Column(String)
-#     job_position = Column(String)
-#     department = Column(String)
-#     work_location = Column(String)
-#     summary = Column(Text)
 
-#     user = relationship("User", overlaps="employee")
-#     managers: Mapped[List[User]] = relationship(
-#         secondary=employee_manager, back_populates="employees"
-#     )
+class Employee(Base):
+    __tablename__ = "employees"
 
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID, ForeignKey("users.id"), unique=True, nullable=False)
+    avatar_url = Column(String)
+    phone = Column(String)
+    job_position = Column(String)
+    department = Column(String)
+    work_location = Column(String)
+    summary = Column(Text)
+
+    user = relationship("User", overlaps="employee")
+    managers: Mapped[List[User]] = relationship(
+        secondary=employee_manager, back_populates="employees"
+    )
 
-# class Experience(Base):
-#     __tablename__ = "experiences"
 
-#     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-#     employee_id = Column(UUID, ForeignKey("employees.id"))
-#     company_name = Column(String)
-#     position = Column(String)
-#     start_date = Column(Date)
-#     end_date = Column(Date)
-#     description = Column(Text)
+class Experience(Base):
+    __tablename__ = "experiences"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    employee_id = Column(UUID, ForeignKey("employees.id"), index=True)
+    company_name = Column(String)
+    position = Column(String)
+    start_date = Column(Date)
+    end_date = Column(Date)
+    description = Column(Text)
+
+    employee = relationship("Employee")
+    projects: Mapped[List[ExperienceProject]] = relationship(
+        back_populates="experience"
+    )
 
-#     employee = relationship("Employee")
 
+project_programming_language = Table(
+    "project_programming_language",
+    Base.metadata,
+    Column(
+        "experience_project_id", ForeignKey("experience_projects.id"), primary_key=True
+    ),
+    Column(
+        "programming_language_id",
+        ForeignKey("programming_languages.id"),
+        primary_key=True,
+    ),
+)
 
-# project_programming_language = Table(
-#     "project_programming_language",
-#     Base.metadata,
-#     Column(
-#         "experience_project_id", ForeignKey("experience_projects.id"), primary_key=True
-#     ),
-#     Column(
-#         "programming_language_id",
-#         ForeignKey("programming_languages.id"),
-#         primary_key=True,
-#     ),
-# )
-
-# project_framework = Table(
-#     "project_framework",
-#     Base.metadata,
-#     Column(
-#         "experience_project_id", ForeignKey("experience_projects.id"), primary_key=True
-#     ),
-#     Column("framework_id", ForeignKey("frameworks.id"), primary_key=True),
-# )
-
-# project_server = Table(
-#     "project_server",
-#     Base.metadata,
-#     Column(
-#         "experience_project_id", ForeignKey("experience_projects.id"), primary_key=True
-#     ),
-#     Column("server_id", ForeignKey("servers.id"), primary_key=True),
-# )
-
-
-# class ExperienceProject(Base):
-#     __tablename__ = "experience_projects"
+project_framework = Table(
+    "project_framework",
+    Base.metadata,
+    Column(
+        "experience_project_id", ForeignKey("experience_projects.id"), primary_key=True
+    ),
+    Column("framework_id", ForeignKey("frameworks.id"), primary_key=True),
+)
 
-#     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-#     experience_id = Column(UUID, ForeignKey("experiences.id"))
-#     name = Column(String)
-#     overview = Column(Text)
-#     team_size = Column(Integer)
-#     website = Column(String)
-#     position = Column(String)
-#     responsibility = Column(Text)
-
-#     experience = relationship("Experience")
-#     programming_languages: Mapped[List[ProgrammingLanguage]] = relationship(
-#         secondary=project_programming_language, back_populates="projects"
-#     )
-#     frameworks: Mapped[List[Framework]] = relationship(
-#         secondary=project_framework, back_populates="projects"
-#     )
-#     servers: Mapped[List[Server]] = relationship(
-#         secondary=project_server, back_populates="projects"
-#     )
-
-
-# class ProgrammingLanguage(Base):
-#     __tablename__ = "programming_languages"
+project_server = Table(
+    "project_server",
+    Base.metadata,
+    Column(
+        "experience_project_id", ForeignKey("experience_projects.id"), primary_key=True
+    ),
+    Column("server_id", ForeignKey("servers.id"), primary_key=True),
+)
 
-#     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-#     language = Column(String, nullable=False)
 
-#     projects: Mapped[List[ExperienceProject]] = relationship(
-#         secondary=project_programming_language, back_populates="programming_languages"
-#     )
+class ExperienceProject(Base):
+    __tablename__ = "experience_projects"
 
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    experience_id = Column(UUID, ForeignKey("experiences.id"), index=True)
+    name = Column(String)
+    overview = Column(Text)
+    team_size = Column(Integer)
+    website = Column(String)
+    position = Column(String)
+    responsibility = Column(Text)
+
+    experience = relationship("Experience", back_populates="projects")
+    programming_languages: Mapped[List[ProgrammingLanguage]] = relationship(
+        secondary=project_programming_language, back_populates="projects"
+    )
+    frameworks: Mapped[List[Framework]] = relationship(
+        secondary=project_framework, back_populates="projects"
+    )
+    servers: Mapped[List[Server]] = relationship(
+        secondary=project_server, back_populates="projects"
+    )
 
-# class Framework(Base):
-#     __tablename__ = "frameworks"
 
-#     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-#     framework = Column(String, nullable=False)
+class ProgrammingLanguage(Base):
+    __tablename__ = "programming_languages"
 
-#     projects: Mapped[List[ExperienceProject]] = relationship(
-#         secondary=project_framework, back_populates="frameworks"
-#     )
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    language = Column(String, nullable=False)
 
+    projects: Mapped[List[ExperienceProject]] = relationship(
+        secondary=project_programming_language, back_populates="programming_languages"
+    )
 
-# class Server(Base):
-#     __tablename__ = "servers"
 
-#     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-#     server = Column(String, nullable=False)
+class Framework(Base):
+    __tablename__ = "frameworks"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    framework = Column(String, nullable=False)
+
+    projects: Mapped[List[ExperienceProject]] = relationship(
+        secondary=project_framework, back_populates="frameworks"
+    )
+
+
+class Server(Base):
+    __tablename__ = "servers"
 
-#     projects: Mapped[List[ExperienceProject]] = relationship(
-#         secondary=project_server, back_populates="servers"
-#     )
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    server = Column(String, nullable=False)
+
+    projects: Mapped[List[ExperienceProject]] = relationship(
+        secondary=project_server, back_populates="servers"
+    )
 
 
 # class Education(Base):
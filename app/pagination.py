@@ -0,0 +1,44 @@
+import base64
+import binascii
+import json
+from uuid import UUID
+
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values) -> str:
+    """Pack the sort key of the last row of a page into an opaque token."""
+    raw = json.dumps([str(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> list[str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def decode_id_cursor(cursor: str | None) -> UUID | None:
+    if cursor is None:
+        return None
+    values = decode_cursor(cursor)
+    try:
+        (last_id,) = values
+        return UUID(last_id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def set_next_cursor(response: Response, rows: list, limit: int):
+    """Advertise the cursor for the next page when this one came back full."""
+    if rows and len(rows) >= limit:
+        last = rows[-1]
+        last_id = last["id"] if isinstance(last, dict) else last.id
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last_id)
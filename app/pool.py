@@ -0,0 +1,56 @@
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class _WaitStatsMixin:
+    """Count checkouts that had to block because the pool was exhausted."""
+
+    waits = 0
+    wait_time = 0.0
+    timeouts = 0
+    _stats_lock = threading.Lock()
+
+    def _do_get(self):
+        blocked = (
+            self.checkedin() == 0
+            and self._max_overflow > -1
+            and self.overflow() >= self._max_overflow
+        )
+        if not blocked:
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            with self._stats_lock:
+                self.waits += 1
+                self.wait_time += time.perf_counter() - start
+
+
+class InstrumentedQueuePool(_WaitStatsMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_WaitStatsMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "waits": getattr(pool, "waits", 0),
+        "wait_time": round(getattr(pool, "wait_time", 0.0), 6),
+        "timeouts": getattr(pool, "timeouts", 0),
+    }
@@ -0,0 +1,148 @@
+import logging
+import os
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from starlette.datastructures import Headers, MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+# A request is profiled when it is picked by SQL_PROFILE_SAMPLE_RATE (0..1),
+# or when SQL_PROFILE_HEADER names a header (e.g. X-DB-Profile) and a client
+# the middleware's ``trusted`` check accepts sends it with a true value. Off
+# by default: profiling re-runs slow SELECTs.
+SQL_PROFILE_HEADER = os.getenv("SQL_PROFILE_HEADER", "").lower()
+SQL_PROFILE_SAMPLE_RATE = float(os.getenv("SQL_PROFILE_SAMPLE_RATE", 0))
+# Statements of a profiled request slower than this get their plan captured.
+# EXPLAIN ANALYZE runs a SELECT a second time; anything else is only planned.
+SQL_PROFILE_EXPLAIN_MS = float(os.getenv("SQL_PROFILE_EXPLAIN_MS", 100))
+SQL_PROFILE_BUFFER_SIZE = int(os.getenv("SQL_PROFILE_BUFFER_SIZE", 100))
+
+QUERIES_HEADER = "X-DB-Queries"
+TIME_HEADER = "X-DB-Time"
+
+
+class Profile:
+    def __init__(self, request: str):
+        self.request = request
+        self.statements: list[tuple[str, str, float, int]] = []
+
+    @property
+    def duration(self):
+        return sum(elapsed for _, _, elapsed, _ in self.statements)
+
+    def log(self):
+        logger.info(
+            "%s: %d statements, %.1f ms",
+            self.request,
+            len(self.statements),
+            self.duration * 1000,
+        )
+        for engine, statement, elapsed, rows in self.statements:
+            logger.info(
+                "  %8.2f ms %6d rows  [%s] %s",
+                elapsed * 1000,
+                rows,
+                engine,
+                " ".join(statement.split()),
+            )
+
+
+current_profile: ContextVar[Profile | None] = ContextVar(
+    "current_profile", default=None
+)
+# Newest last; deque appends and pops are atomic, so no lock.
+slow_queries: deque = deque(maxlen=SQL_PROFILE_BUFFER_SIZE)
+
+
+def _explain(conn, statement: str, parameters, analyze: bool):
+    explain = "EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN "
+    # A fresh cursor: the profiled statement's rows are still being read.
+    # The savepoint keeps a failing EXPLAIN from aborting the transaction.
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute("SAVEPOINT sql_profile")
+        try:
+            cursor.execute(explain + statement, parameters)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+        except Exception as exc:
+            cursor.execute("ROLLBACK TO SAVEPOINT sql_profile")
+            plan = f"EXPLAIN failed: {exc}"
+        cursor.execute("RELEASE SAVEPOINT sql_profile")
+    except Exception as exc:
+        plan = f"EXPLAIN failed: {exc}"
+    finally:
+        cursor.close()
+    return plan
+
+
+def record(conn, cursor, statement, parameters, many, engine: str, elapsed: float):
+    """Called for every statement; a no-op outside a profiled request."""
+    profile = current_profile.get()
+    if profile is None:
+        return
+    rows = cursor.rowcount
+    profile.statements.append((engine, statement, elapsed, rows))
+    if many or elapsed * 1000 < SQL_PROFILE_EXPLAIN_MS:
+        return
+    operation = statement.lstrip().split(None, 1)[0].upper()
+    slow_queries.append(
+        {
+            "at": time.time(),
+            "request": profile.request,
+            "engine": engine,
+            "duration_ms": round(elapsed * 1000, 3),
+            "rows": rows,
+            "statement": statement,
+            "plan": _explain(conn, statement, parameters, operation == "SELECT"),
+        }
+    )
+
+
+def _wanted(scope, trusted):
+    if SQL_PROFILE_HEADER:
+        value = Headers(scope=scope).get(SQL_PROFILE_HEADER, "")
+        if value.lower() in ("1", "true", "yes") and trusted(scope):
+            return True
+    return SQL_PROFILE_SAMPLE_RATE > 0 and random.random() < SQL_PROFILE_SAMPLE_RATE
+
+
+class ProfilerMiddleware:
+    """Pure ASGI middleware profiling the SQL of selected requests.
+
+    The statement count and total time go out as X-DB-Queries and X-DB-Time
+    (milliseconds), the per-statement breakdown to the log, and slow
+    statements with their plans to ``slow_queries``. Statements issued after
+    the response has started, e.g. while streaming, only reach the log.
+    ``trusted(scope)`` decides who may ask for a profile with the header.
+    """
+
+    def __init__(self, app, trusted=lambda scope: False):
+        self.app = app
+        self.trusted = trusted
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wanted(scope, self.trusted):
+            return await self.app(scope, receive, send)
+
+        profile = Profile(f"{scope['method']} {scope['path']}")
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers[QUERIES_HEADER] = str(len(profile.statements))
+                headers[TIME_HEADER] = f"{profile.duration * 1000:.1f}"
+            await send(message)
+
+        token = current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
+            profile.log()
+
+
+def stats():
+    return list(reversed(slow_queries))
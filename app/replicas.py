@@ -0,0 +1,91 @@
+import itertools
+import time
+
+from sqlalchemy import orm
+from sqlalchemy.exc import DBAPIError, TimeoutError
+
+from .pool import pool_stats
+
+
+class ReplicaSet:
+    """Round-robin over replica engines, skipping ones that recently failed."""
+
+    def __init__(self, engines: dict, retry_after: float = 30):
+        self.engines = list(engines.items())
+        self.retry_after = retry_after
+        self._down_until: dict[str, float] = {}
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self.engines)
+
+    def candidates(self):
+        if not self.engines:
+            return
+        start = next(self._counter)
+        now = time.monotonic()
+        for i in range(len(self.engines)):
+            name, engine = self.engines[(start + i) % len(self.engines)]
+            if self._down_until.get(name, 0) <= now:
+                yield name, engine
+
+    def mark_down(self, name: str):
+        self._down_until[name] = time.monotonic() + self.retry_after
+
+    def connect(self):
+        """Check out a connection from the next healthy replica, or None.
+
+        Async engines hand out their sync-facing connection, so call this
+        from inside the session's greenlet for those.
+        """
+        for name, engine in self.candidates():
+            try:
+                return getattr(engine, "sync_engine", engine).connect()
+            except (DBAPIError, OSError):
+                # asyncpg surfaces refused connections as bare OSErrors.
+                self.mark_down(name)
+            except TimeoutError:
+                pass
+        return None
+
+    def stats(self):
+        now = time.monotonic()
+        return [
+            {
+                "host": name,
+                "down": self._down_until.get(name, 0) > now,
+                **pool_stats(getattr(engine, "sync_engine", engine)),
+            }
+            for name, engine in self.engines
+        ]
+
+
+class ReplicaSession(orm.Session):
+    """Session that picks its connection on first use: a replica from
+    ``replicas`` when one is reachable, else ``fallback``.
+
+    Requests that never reach the database, e.g. ones answered from the role
+    cache, check nothing out.
+    """
+
+    def __init__(self, *args, replicas: ReplicaSet, fallback, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+        self.fallback = fallback
+        self._replica = None
+        self._picked = False
+
+    def get_bind(self, *args, **kwargs):
+        if not self._picked:
+            self._picked = True
+            self._replica = self.replicas.connect()
+        return self._replica or self.fallback
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            if self._replica is not None:
+                self._replica.close()
+            self._replica = None
+            self._picked = False
@@ -0,0 +1,148 @@
+import bisect
+import hashlib
+import os
+import threading
+import time
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import models
+from . import schemas
+
+ROLE_CACHE_TTL = float(os.getenv("ROLE_CACHE_TTL", 60))
+
+
+class RoleCache:
+    """In-memory copy of the roles table, indexed by id and by name."""
+
+    def __init__(self, ttl: float = ROLE_CACHE_TTL):
+        self.ttl = ttl
+        self.version = 0
+        self.loaded_at = float("-inf")
+        self._by_id: dict[UUID, schemas.Role] = {}
+        self._by_name: dict[str, schemas.Role] = {}
+        self._ids: list[UUID] = []
+        self.fingerprint = self._fingerprint()
+        self._lock = threading.Lock()
+
+    def load(self, db_roles):
+        by_id = {
+            role.id: role
+            for role in (
+                schemas.Role.model_validate(db_role, from_attributes=True)
+                for db_role in db_roles
+            )
+        }
+        with self._lock:
+            self._by_id = by_id
+            self._by_name = {role.role: role for role in by_id.values()}
+            self._ids = sorted(by_id)
+            self.fingerprint = self._fingerprint()
+            self.version += 1
+            self.loaded_at = time.monotonic()
+
+    def add(self, db_role):
+        role = schemas.Role.model_validate(db_role, from_attributes=True)
+        with self._lock:
+            if role.id not in self._by_id:
+                bisect.insort(self._ids, role.id)
+            self._by_id[role.id] = role
+            self._by_name[role.role] = role
+            self.fingerprint = self._fingerprint()
+            self.version += 1
+
+    def _fingerprint(self):
+        # Same for every worker holding the same catalog, unlike ``version``.
+        digest = hashlib.blake2b(digest_size=12)
+        for role_id in self._ids:
+            digest.update(f"{role_id}:{self._by_id[role_id].role}\n".encode())
+        return digest.hexdigest()
+
+    def expired(self):
+        return time.monotonic() - self.loaded_at > self.ttl
+
+    def get(self, role_id: UUID):
+        return self._by_id.get(role_id)
+
+    def get_by_name(self, role: str):
+        return self._by_name.get(role)
+
+    def missing(self, role_ids):
+        return [role_id for role_id in role_ids if role_id not in self._by_id]
+
+    def page(self, skip: int = 0, limit: int = 100, after: UUID | None = None):
+        # Same order and cursor semantics as crud.get_roles.
+        ids = self._ids
+        start = skip if after is None else bisect.bisect_right(ids, after)
+        return [self._by_id[role_id] for role_id in ids[start : start + limit]]
+
+    def stats(self):
+        return {
+            "size": len(self._by_id),
+            "version": self.version,
+            "age": round(time.monotonic() - self.loaded_at, 3),
+        }
+
+
+role_cache = RoleCache()
+
+
+def refresh(db: Session):
+    role_cache.load(db.scalars(select(models.Role)).all())
+
+
+async def refresh_async(db: AsyncSession):
+    role_cache.load((await db.scalars(select(models.Role))).all())
+
+
+def current(db: Session):
+    if role_cache.expired():
+        refresh(db)
+    return role_cache
+
+
+async def current_async(db: AsyncSession):
+    if role_cache.expired():
+        await refresh_async(db)
+    return role_cache
+
+
+def missing_role_ids(db: Session, role_ids):
+    """Return the ids in ``role_ids`` that do not exist.
+
+    Ids the cache does not know, e.g. roles created by another worker, are
+    fetched directly and added to it, so only truly unknown ids come back.
+    """
+    missing = current(db).missing(role_ids)
+    if missing:
+        for db_role in db.scalars(
+            select(models.Role).where(models.Role.id.in_(missing))
+        ):
+            role_cache.add(db_role)
+        missing = role_cache.missing(missing)
+    return missing
+
+
+async def missing_role_ids_async(db: AsyncSession, role_ids):
+    missing = (await current_async(db)).missing(role_ids)
+    if missing:
+        for db_role in await db.scalars(
+            select(models.Role).where(models.Role.id.in_(missing))
+        ):
+            role_cache.add(db_role)
+        missing = role_cache.missing(missing)
+    return missing
+
+
+def ensure_cached(db: Session, role_ids):
+    """Make every id in ``role_ids`` resolvable through ``role_cache``."""
+    missing_role_ids(db, role_ids)
+    return role_cache
+
+
+async def ensure_cached_async(db: AsyncSession, role_ids):
+    await missing_role_ids_async(db, role_ids)
+    return role_cache
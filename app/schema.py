@@ -0,0 +1,56 @@
+import logging
+import os
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# What a worker does about the schema at startup:
+#   alembic     compare alembic_version with the migration head and refuse to
+#               start on a mismatch (default; one indexed read)
+#   create_all  the old behaviour, for throwaway development databases
+#   off         nothing; migrations are the deploy pipeline's job
+DB_SCHEMA_CHECK = os.getenv("DB_SCHEMA_CHECK", "alembic").lower()
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(__file__)), "alembic.ini")
+
+
+class SchemaMismatchError(RuntimeError):
+    pass
+
+
+def alembic_head():
+    # Imported here: only workers that run the check pay for Alembic.
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    config = Config(ALEMBIC_INI)
+    config.set_main_option(
+        "script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "alembic")
+    )
+    return ScriptDirectory.from_config(config).get_current_head()
+
+
+def check_schema(engine):
+    """Apply DB_SCHEMA_CHECK; an unreachable database is logged, not fatal."""
+    if DB_SCHEMA_CHECK == "off":
+        return
+    try:
+        if DB_SCHEMA_CHECK == "create_all":
+            models.Base.metadata.create_all(bind=engine)
+            return
+        with engine.connect() as conn:
+            current = conn.scalar(text("SELECT version_num FROM alembic_version"))
+    except OperationalError as exc:
+        logger.warning("Schema check skipped, database unreachable: %s", exc.orig)
+        return
+    except ProgrammingError:
+        current = None
+    head = alembic_head()
+    if current != head:
+        raise SchemaMismatchError(
+            f"Database schema is at revision {current}, expected {head}; "
+            "run `alembic upgrade head` (or set DB_SCHEMA_CHECK=off)"
+        )
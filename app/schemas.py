@@ -1,3 +1,5 @@
+from datetime import date
+from typing import Literal
 from uuid import UUID
 from pydantic import BaseModel
 
@@ -25,6 +27,38 @@ class User(UserBase):
     roles: list[Role] = []
 
 
+class UserBatchLookup(BaseModel):
+    by: Literal["id", "email", "badge_number"] = "badge_number"
+    keys: list[str]
+
+
+class UserBatchResult(BaseModel):
+    found: dict[str, User] = {}
+    missing: list[str] = []
+
+
+class UserChanges(BaseModel):
+    users: list[User] = []
+    roles: list[Role] = []
+    deleted_users: list[UUID] = []
+    deleted_roles: list[UUID] = []
+    # Pass back as ?since= for the changes after this page; start without
+    # one for a full sync. While more is true the next page is ready now.
+    next: str
+    more: bool = False
+
+
+class UserImportError(BaseModel):
+    line: int
+    email: str | None = None
+    error: str
+
+
+class UserImportResult(BaseModel):
+    created: int = 0
+    errors: list[UserImportError] = []
+
+
 # class UserLogin(BaseModel):
 #     email: str
 #     password: str
@@ -40,20 +74,98 @@ class User(UserBase):
 #     email: str | None = None
 
 
-# class EmployeeBase(BaseModel):
-#     avatar_url: str | None = None
-#     phone: str | None = None
-#     job_position: str | None = None
-#     department: str | None = None
-#     work_location: str | None = None
-#     summary: str | None = None
+class EmployeeBase(BaseModel):
+    avatar_url: str | None = None
+    phone: str | None = None
+    job_position: str | None = None
+    department: str | None = None
+    work_location: str | None = None
+    summary: str | None = None
+
+
+class EmployeeCreate(EmployeeBase):
+    managers: list[UUID] = []
+
+
+class Employee(EmployeeBase):
+    id: UUID
+    user_id: UUID
+    managers: list[User] = []
+
+
+class HierarchyEntry(BaseModel):
+    depth: int
+    user: User
+
+
+class SkillCreate(BaseModel):
+    name: str
+
+
+class Skill(SkillCreate):
+    id: UUID
 
 
-# class EmployeeCreate(EmployeeBase):
-#     managers: list[UUID] = []
+class SkillCount(Skill):
+    count: int
 
 
-# class Employee(EmployeeBase):
-#     id: UUID
-#     user_id: UUID
-#     managers: list[User] = []
+class SkillSearchResult(BaseModel):
+    total: int
+    employees: list[Employee] = []
+    facets: dict[str, list[SkillCount]] = {}
+
+
+class ProgrammingLanguage(BaseModel):
+    id: UUID
+    language: str
+
+
+class Framework(BaseModel):
+    id: UUID
+    framework: str
+
+
+class Server(BaseModel):
+    id: UUID
+    server: str
+
+
+class ExperienceProjectBase(BaseModel):
+    name: str | None = None
+    overview: str | None = None
+    team_size: int | None = None
+    website: str | None = None
+    position: str | None = None
+    responsibility: str | None = None
+
+
+class ExperienceProjectCreate(ExperienceProjectBase):
+    programming_languages: list[UUID] = []
+    frameworks: list[UUID] = []
+    servers: list[UUID] = []
+
+
+class ExperienceProject(ExperienceProjectBase):
+    id: UUID
+    programming_languages: list[ProgrammingLanguage] = []
+    frameworks: list[Framework] = []
+    servers: list[Server] = []
+
+
+class ExperienceBase(BaseModel):
+    company_name: str | None = None
+    position: str | None = None
+    start_date: date | None = None
+    end_date: date | None = None
+    description: str | None = None
+
+
+class ExperienceCreate(ExperienceBase):
+    projects: list[ExperienceProjectCreate] = []
+
+
+class Experience(ExperienceBase):
+    id: UUID
+    employee_id: UUID
+    projects: list[ExperienceProject] = []
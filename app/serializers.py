@@ -0,0 +1,55 @@
+import json
+from collections import defaultdict
+
+try:
+    import orjson
+except ImportError:  # plain json is slower but produces the same bytes shape
+    orjson = None
+
+
+def dumps(value) -> bytes:
+    """Encode plain dicts/lists; UUIDs are written as strings like Pydantic does."""
+    if orjson is not None:
+        # default=str covers asyncpg's UUID subclass, which orjson rejects.
+        return orjson.dumps(value, default=str)
+    return json.dumps(value, default=str, separators=(",", ":")).encode()
+
+
+def role_dict(role):
+    # Same keys, in the same order, as schemas.Role.
+    return {"role": role.role, "id": role.id}
+
+
+def user_dicts(rows, links=(), role_catalog=None, fields=None):
+    """Map (id, name, email, badge_number) rows and (user_id, role_id) links
+    straight to the schemas.User shape, without building models per row.
+
+    With ``fields`` only those keys are written, read off the rows by name.
+    """
+    role_dicts = {}
+    roles_by_user = defaultdict(list)
+    for user_id, role_id in links:
+        role = role_dicts.get(role_id)
+        if role is None:
+            role = role_dicts[role_id] = role_dict(role_catalog.get(role_id))
+        roles_by_user[user_id].append(role)
+    if fields is not None:
+        columns = [field for field in fields if field != "roles"]
+        with_roles = "roles" in fields
+        dicts = []
+        for row in rows:
+            user = {field: getattr(row, field) for field in columns}
+            if with_roles:
+                user["roles"] = roles_by_user.get(row.id, [])
+            dicts.append(user)
+        return dicts
+    return [
+        {
+            "name": row.name,
+            "email": row.email,
+            "badge_number": row.badge_number,
+            "id": row.id,
+            "roles": roles_by_user.get(row.id, []),
+        }
+        for row in rows
+    ]
@@ -0,0 +1,250 @@
+import os
+import threading
+import time
+from functools import reduce
+from operator import and_, or_
+from uuid import UUID
+
+from sqlalchemy import literal, select, union, union_all
+from sqlalchemy.orm import Session
+
+from . import models
+from . import schemas
+
+SKILL_INDEX_TTL = float(os.getenv("SKILL_INDEX_TTL", 60))
+
+# Facet name -> (catalog model, name column, link-table column to projects).
+FACETS = {
+    "language": (
+        models.ProgrammingLanguage,
+        models.ProgrammingLanguage.language,
+        models.project_programming_language.c.programming_language_id,
+    ),
+    "framework": (
+        models.Framework,
+        models.Framework.framework,
+        models.project_framework.c.framework_id,
+    ),
+    "server": (
+        models.Server,
+        models.Server.server,
+        models.project_server.c.server_id,
+    ),
+}
+
+
+def catalog_statement():
+    return union_all(
+        *(
+            select(literal(facet).label("facet"), model.id, name.label("name"))
+            for facet, (model, name, _) in FACETS.items()
+        )
+    )
+
+
+def employee_skills_statement(employee_id: UUID | None = None):
+    """Distinct (facet, employee_id, skill_id) rows across all projects."""
+    parts = []
+    for facet, (_, _, skill_column) in FACETS.items():
+        link = skill_column.table
+        query = (
+            select(
+                literal(facet).label("facet"),
+                models.Experience.employee_id,
+                skill_column.label("skill_id"),
+            )
+            .join_from(
+                link,
+                models.ExperienceProject,
+                models.ExperienceProject.id == link.c.experience_project_id,
+            )
+            .join(
+                models.Experience,
+                models.Experience.id == models.ExperienceProject.experience_id,
+            )
+        )
+        if employee_id is not None:
+            query = query.where(models.Experience.employee_id == employee_id)
+        parts.append(query)
+    return union(*parts)
+
+
+class SkillIndex:
+    """Per-skill bitmaps over employees for faceted search.
+
+    Every employee with a skill owns one bit position and every skill keeps a
+    Python int with the bits of the employees who used it, so AND/OR filters
+    and facet counts are integer operations and popcounts rather than joins.
+    """
+
+    def __init__(self, ttl: float = SKILL_INDEX_TTL):
+        self.ttl = ttl
+        self.version = 0
+        self.loaded_at = float("-inf")
+        self._lock = threading.Lock()
+        self._names: dict[str, dict[UUID, str]] = {facet: {} for facet in FACETS}
+        self._by_name: dict[str, dict[str, set[UUID]]] = {facet: {} for facet in FACETS}
+        self._slots: dict[UUID, int] = {}
+        self._employees: list[UUID] = []
+        self._skills: dict[UUID, set[tuple[str, UUID]]] = {}
+        self._bitmaps: dict[tuple[str, UUID], int] = {}
+        self._universe = 0
+
+    def load(self, catalog_rows, skill_rows):
+        names = {facet: {} for facet in FACETS}
+        by_name = {facet: {} for facet in FACETS}
+        for facet, skill_id, name in catalog_rows:
+            names[facet][skill_id] = name
+            by_name[facet].setdefault(name.lower(), set()).add(skill_id)
+        skills: dict[UUID, set] = {}
+        for facet, employee_id, skill_id in skill_rows:
+            skills.setdefault(employee_id, set()).add((facet, skill_id))
+        employees = sorted(skills)
+        bitmaps: dict[tuple[str, UUID], int] = {}
+        for slot, employee_id in enumerate(employees):
+            bit = 1 << slot
+            for key in skills[employee_id]:
+                bitmaps[key] = bitmaps.get(key, 0) | bit
+        with self._lock:
+            self._names = names
+            self._by_name = by_name
+            self._slots = {
+                employee_id: slot for slot, employee_id in enumerate(employees)
+            }
+            self._employees = employees
+            self._skills = skills
+            self._bitmaps = bitmaps
+            self._universe = (1 << len(employees)) - 1
+            self.version += 1
+            self.loaded_at = time.monotonic()
+
+    def add_skill(self, facet: str, skill_id: UUID, name: str):
+        with self._lock:
+            self._names[facet][skill_id] = name
+            self._by_name[facet].setdefault(name.lower(), set()).add(skill_id)
+            self.version += 1
+
+    def update_employee(self, employee_id: UUID, skill_rows):
+        """Replace one employee's skills; only the bitmaps that changed move."""
+        skills = {(facet, skill_id) for facet, _, skill_id in skill_rows}
+        with self._lock:
+            slot = self._slots.get(employee_id)
+            if slot is None:
+                if not skills:
+                    return
+                slot = self._slots[employee_id] = len(self._employees)
+                self._employees.append(employee_id)
+            bit = 1 << slot
+            previous = self._skills.get(employee_id, set())
+            for key in previous - skills:
+                self._bitmaps[key] &= ~bit
+            for key in skills - previous:
+                self._bitmaps[key] = self._bitmaps.get(key, 0) | bit
+            self._skills[employee_id] = skills
+            if skills:
+                self._universe |= bit
+            else:
+                self._universe &= ~bit
+            self.version += 1
+
+    def expired(self):
+        return time.monotonic() - self.loaded_at > self.ttl
+
+    def skills(self, facet: str):
+        return sorted(
+            (
+                schemas.Skill(id=skill_id, name=name)
+                for skill_id, name in self._names[facet].items()
+            ),
+            key=lambda skill: skill.name.lower(),
+        )
+
+    def has_name(self, facet: str, name: str):
+        return name.lower() in self._by_name[facet]
+
+    def _mask(self, facet: str, names: list[str], match_all: bool):
+        masks = []
+        for name in names:
+            mask = 0
+            for skill_id in self._by_name[facet].get(name.lower(), ()):
+                mask |= self._bitmaps.get((facet, skill_id), 0)
+            masks.append(mask)
+        return reduce(and_ if match_all else or_, masks)
+
+    def search(
+        self,
+        filters: dict[str, list[str]],
+        match_all: bool = False,
+        skip: int = 0,
+        limit: int = 100,
+    ):
+        """Return (employee ids for the page, total, facet counts).
+
+        Names within a facet are OR-ed (AND-ed with ``match_all``) and facets
+        are AND-ed. With OR, a facet's counts ignore that facet's own filter
+        so the other values stay selectable.
+        """
+        with self._lock:
+            masks = {
+                facet: self._mask(facet, names, match_all)
+                for facet, names in filters.items()
+                if names
+            }
+            result = reduce(and_, masks.values(), self._universe)
+            facets = {}
+            for facet in FACETS:
+                base = result
+                if not match_all and facet in masks:
+                    base = reduce(
+                        and_,
+                        (mask for other, mask in masks.items() if other != facet),
+                        self._universe,
+                    )
+                counts = []
+                for skill_id, name in self._names[facet].items():
+                    count = (base & self._bitmaps.get((facet, skill_id), 0)).bit_count()
+                    if count:
+                        counts.append(
+                            schemas.SkillCount(id=skill_id, name=name, count=count)
+                        )
+                counts.sort(key=lambda skill: (-skill.count, skill.name.lower()))
+                facets[facet] = counts
+
+            employee_ids, position, bits = [], 0, result
+            while bits and len(employee_ids) < limit:
+                lowest = bits & -bits
+                if position >= skip:
+                    employee_ids.append(self._employees[lowest.bit_length() - 1])
+                position += 1
+                bits ^= lowest
+        return employee_ids, result.bit_count(), facets
+
+    def stats(self):
+        return {
+            "employees": self._universe.bit_count(),
+            "skills": sum(len(names) for names in self._names.values()),
+            "version": self.version,
+            "age": round(time.monotonic() - self.loaded_at, 3),
+        }
+
+
+skill_index = SkillIndex()
+
+
+def refresh(db: Session):
+    skill_index.load(
+        db.execute(catalog_statement()).all(),
+        db.execute(employee_skills_statement()).all(),
+    )
+
+
+def current(db: Session):
+    if skill_index.expired():
+        refresh(db)
+    return skill_index
+
+
+def refresh_employee(db: Session, employee_id: UUID):
+    skill_index.update_employee(
+        employee_id, db.execute(employee_skills_statement(employee_id)).all()
+    )
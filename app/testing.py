@@ -0,0 +1,43 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements: list[str] = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries(engine):
+    """Record every SQL statement sent through ``engine`` inside the block."""
+    counter = QueryCounter()
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        counter.statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@contextmanager
+def assert_num_queries(engine, expected: int):
+    """Fail when the block issues a different number of statements, e.g.
+
+    with assert_num_queries(engine, 2):
+        client.get("/users/", headers=auth_headers)
+    """
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count != expected:
+        raise AssertionError(
+            f"expected {expected} SQL statements, got {counter.count}:\n"
+            + "\n".join(counter.statements)
+        )
@@ -0,0 +1,415 @@
+"""Offline load benchmark for the API.
+
+Seeds a throwaway Postgres database, replaces the Zoho user-info call with a
+local fake and drives the FastAPI app in-process at fixed concurrency levels:
+
+    python -m bench.run --users 10000 --roles 20 --concurrency 1,16,64 \
+        --output bench/results.json --compare bench/baseline.json
+
+The API relies on PostgreSQL-only SQL (RETURNING CTEs, ON CONFLICT, read-only
+transactions), so the suite needs a real Postgres server; DB_USER, DB_PASS,
+DB_HOST and DB_PORT are read as usual and --db-name picks the database, which
+is created if it does not exist.
+
+The search_users scenario also needs the pg_trgm extension. It builds the
+same GiST index as migration 0002 and stores the EXPLAIN ANALYZE of one
+search plus the execution times of fifty in the report, e.g. on a million
+users:
+
+    python -m bench.run --users 1000000 --scenarios search_users
+
+It exits with status 1 when the plan does not use the index.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import AsyncExitStack
+from datetime import datetime, timezone
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-name", default="employee_bench")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--roles", type=int, default=20)
+    parser.add_argument("--concurrency", default="1,16,64")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument(
+        "--tokens",
+        type=int,
+        default=1,
+        help="distinct Zoho tokens to rotate through (1 keeps the cache warm)",
+    )
+    parser.add_argument(
+        "--scenarios", default="list_users,list_roles,create_user", help="comma list"
+    )
+    parser.add_argument("--no-seed", action="store_true", help="reuse existing data")
+    parser.add_argument("--output", default="bench/results.json")
+    parser.add_argument("--compare", help="previous results file to diff against")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def ensure_database(db_name: str):
+    from sqlalchemy import create_engine, text
+
+    admin = create_engine(
+        f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASS')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/postgres",
+        isolation_level="AUTOCOMMIT",
+    )
+    with admin.connect() as conn:
+        exists = conn.scalar(
+            text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": db_name}
+        )
+        if not exists:
+            conn.execute(text(f'CREATE DATABASE "{db_name}"'))
+    admin.dispose()
+
+
+def seed(args):
+    from sqlalchemy import insert, text
+
+    from app import models
+    from app.database import engine
+
+    rng = random.Random(args.seed)
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("TRUNCATE user_role, users, roles CASCADE"))
+        role_ids = [uuid.uuid4() for _ in range(args.roles)]
+        conn.execute(
+            insert(models.Role),
+            [
+                {"id": role_id, "role": f"role-{i}"}
+                for i, role_id in enumerate(role_ids)
+            ],
+        )
+        for start in range(0, args.users, 5000):
+            users, links = [], []
+            for i in range(start, min(start + 5000, args.users)):
+                user_id = uuid.uuid4()
+                users.append(
+                    {
+                        "id": user_id,
+                        "name": f"Bench User {i}",
+                        "email": f"bench-{i}@example.com",
+                        "badge_number": f"B{i:08d}",
+                    }
+                )
+                for role_id in rng.sample(role_ids, k=min(len(role_ids), 3)):
+                    links.append({"user_id": user_id, "role_id": role_id})
+            conn.execute(insert(models.User), users)
+            if links:
+                conn.execute(insert(models.user_role), links)
+        if "search_users" in args.scenarios.split(","):
+            conn.execute(text(SEARCH_INDEX_DDL))
+        conn.execute(text("ANALYZE users; ANALYZE roles; ANALYZE user_role"))
+    return role_ids
+
+
+# Built after the rows are in, which is much faster than maintaining it.
+SEARCH_INDEX_DDL = """
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    CREATE INDEX IF NOT EXISTS ix_users_search_trgm ON users
+        USING gist ((name || ' ' || email || ' ' || badge_number)
+                    gist_trgm_ops(siglen=64))
+"""
+
+
+def search_term(rng, user_count: int):
+    return f"user {rng.randrange(user_count)}"
+
+
+# The request's goal for one search on a million users.
+SEARCH_TARGET_MS = 10
+
+
+def search_plan(args, samples: int = 50):
+    """EXPLAIN ANALYZE of /users/search queries, to show the index is used.
+
+    Keeps the first plan and the server-side execution times of ``samples``
+    random terms, so the report says whether the GiST index was picked and
+    how the search compares with SEARCH_TARGET_MS.
+    """
+    from sqlalchemy.dialects import postgresql
+
+    from app import crud
+    from app.database import engine
+
+    rng = random.Random(args.seed)
+    plan, timings = None, []
+    with engine.connect() as conn:
+        cursor = conn.connection.cursor()
+        for _ in range(samples):
+            statement = crud.search_users_statement(
+                search_term(rng, args.users), 20
+            ).compile(
+                dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+            )
+            if plan is None:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {statement}")
+                plan = [row[0] for row in cursor.fetchall()]
+            cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {statement}")
+            timings.append(cursor.fetchone()[0][0]["Execution Time"])
+    timings.sort()
+    return {
+        "plan": plan,
+        "uses_index": any("ix_users_search_trgm" in line for line in plan),
+        "p50_ms": round(percentile(timings, 0.50), 3),
+        "p99_ms": round(percentile(timings, 0.99), 3),
+        "target_ms": SEARCH_TARGET_MS,
+    }
+
+
+def fake_zoho_transport(user_count: int):
+    import httpx
+
+    def handler(request):
+        # Tokens look like "bench-token-<n>"; each maps onto a seeded user.
+        n = int(request.headers["Authorization"].rsplit("-", 1)[-1])
+        return httpx.Response(
+            200, json={"Email": f"bench-{n % user_count}@example.com"}
+        )
+
+    return httpx.MockTransport(handler)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(
+        len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1)
+    )
+    return sorted_values[index]
+
+
+def make_scenarios(args, role_ids):
+    rng = random.Random(args.seed)
+    tokens = itertools.cycle(f"bench-token-{n}" for n in range(args.tokens))
+    counter = itertools.count()
+    run_id = uuid.uuid4().hex[:8]
+
+    def list_users():
+        return (
+            "GET",
+            f"/users/?limit={args.page_size}",
+            {"headers": {"Authorization": next(tokens)}},
+        )
+
+    def list_roles():
+        return "GET", "/roles/", {}
+
+    def search_users():
+        return (
+            "GET",
+            "/users/search",
+            {
+                "params": {"q": search_term(rng, args.users)},
+                "headers": {"Authorization": next(tokens)},
+            },
+        )
+
+    def create_user():
+        n = next(counter)
+        return (
+            "POST",
+            "/users/",
+            {
+                "json": {
+                    "name": f"Created {n}",
+                    "email": f"created-{run_id}-{n}@example.com",
+                    "badge_number": f"C{run_id}{n:08d}",
+                    "roles": [
+                        str(r) for r in rng.sample(role_ids, k=min(2, len(role_ids)))
+                    ],
+                }
+            },
+        )
+
+    available = {
+        "list_users": list_users,
+        "list_roles": list_roles,
+        "create_user": create_user,
+        "search_users": search_users,
+    }
+    return {name: available[name] for name in args.scenarios.split(",")}
+
+
+async def run_scenario(client, make_request, concurrency: int, total: int):
+    from app.database import async_engine, engine
+    from app.testing import count_queries
+
+    latencies, errors = [], 0
+    remaining = itertools.count()
+
+    async def worker():
+        nonlocal errors
+        while next(remaining) < total:
+            method, url, kwargs = make_request()
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    engines = [engine] + ([async_engine.sync_engine] if async_engine else [])
+    async with AsyncExitStack() as stack:
+        counters = [stack.enter_context(count_queries(e)) for e in engines]
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    statements = sum(counter.count for counter in counters)
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "sql_per_request": round(statements / max(len(latencies), 1), 3),
+    }
+
+
+async def run(args, role_ids):
+    import httpx
+
+    import main
+
+    results = []
+    async with main.lifespan(main.app):
+        await main.app.state.zoho_client.aclose()
+        main.app.state.zoho_client = httpx.AsyncClient(
+            transport=fake_zoho_transport(args.users)
+        )
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            scenarios = make_scenarios(args, role_ids)
+            for name, make_request in scenarios.items():
+                # One untimed request warms imports, caches and the pool.
+                method, url, kwargs = make_request()
+                await client.request(method, url, **kwargs)
+                for concurrency in (int(c) for c in args.concurrency.split(",")):
+                    result = await run_scenario(
+                        client, make_request, concurrency, args.requests
+                    )
+                    result["scenario"] = name
+                    results.append(result)
+                    print(
+                        f"{name:<12} c={concurrency:<4} "
+                        f"{result['throughput_rps']:>9.1f} req/s  "
+                        f"p50 {result['p50_ms']:>8.2f} ms  "
+                        f"p95 {result['p95_ms']:>8.2f} ms  "
+                        f"p99 {result['p99_ms']:>8.2f} ms  "
+                        f"sql/req {result['sql_per_request']:.2f}  "
+                        f"errors {result['errors']}"
+                    )
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous_path: str, results: list[dict]):
+    with open(previous_path) as f:
+        previous = {
+            (r["scenario"], r["concurrency"]): r for r in json.load(f)["results"]
+        }
+    print(f"\nvs {previous_path}:")
+    for result in results:
+        before = previous.get((result["scenario"], result["concurrency"]))
+        if not before:
+            continue
+        print(
+            f"{result['scenario']:<12} c={result['concurrency']:<4} "
+            + "  ".join(
+                f"{key} {(result[key] - before[key]) / before[key] * 100:+.1f}%"
+                for key in ("throughput_rps", "p50_ms", "p99_ms")
+                if before[key]
+            )
+            + f"  sql/req {before['sql_per_request']} -> {result['sql_per_request']}"
+        )
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    os.environ["DB_NAME"] = args.db_name
+    # seed() creates the tables itself; the bench database is not migrated.
+    os.environ.setdefault("DB_SCHEMA_CHECK", "create_all")
+    # Simulated clients share a few tokens; measure the app, not the limiter.
+    os.environ.setdefault("RATE_LIMIT_PER_SECOND", "0")
+    # Every client asks for the same pages; without this the list scenarios
+    # would time the response cache instead of the queries behind it.
+    os.environ.setdefault("RESPONSE_CACHE_TTL", "0")
+    ensure_database(args.db_name)
+    if args.no_seed:
+        from sqlalchemy import select
+
+        from app import models
+        from app.database import Session
+
+        with Session() as db:
+            role_ids = list(db.scalars(select(models.Role.id)))
+    else:
+        role_ids = seed(args)
+
+    results = asyncio.run(run(args, role_ids))
+    plans = {}
+    if "search_users" in args.scenarios.split(","):
+        search = plans["search_users"] = search_plan(args)
+        print("\n".join(["", "search_users plan:", *search["plan"]]))
+        print(
+            f"trigram index {'used' if search['uses_index'] else 'NOT used'}, "
+            f"execution p50 {search['p50_ms']} ms, p99 {search['p99_ms']} ms "
+            f"(target {search['target_ms']} ms)"
+        )
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "db_async": os.getenv("DB_ASYNC", "false"),
+            "args": vars(args),
+        },
+        "results": results,
+        "plans": plans,
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {args.output}")
+    if args.compare:
+        compare(args.compare, results)
+    if plans.get("search_users", {}).get("uses_index") is False:
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
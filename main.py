@@ -1,92 +1,311 @@
+import logging
+import time
+
+# Taken before the heavy imports below so import cost shows up in
+# app_startup_seconds.
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from typing import Annotated
-from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from typing import Annotated, Literal
+from uuid import UUID
+from fastapi import (
+    APIRouter,
+    Depends,
+    FastAPI,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
 from fastapi.middleware.cors import CORSMiddleware
-
-from fastapi.security import OAuth2
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy.exc import IntegrityError, OperationalError
 from sqlalchemy.orm import Session
 
-from app import models, crud, schemas
-from app.database import Session, engine, get_db
-from app.auth import verify_zoho_user
-
-models.Base.metadata.create_all(bind=engine)
+from app import (
+    admission,
+    async_api,
+    changes,
+    compression,
+    crud,
+    etag,
+    exporter,
+    hierarchy,
+    importer,
+    metrics,
+    profiler,
+    roles,
+    schema,
+    schemas,
+    serializers,
+    skills,
+)
+from app.pool import pool_stats
+from app.pagination import NEXT_CURSOR_HEADER, decode_id_cursor, set_next_cursor
+from app.database import (
+    DB_ASYNC,
+    Session,
+    async_engine,
+    async_replicas,
+    engine,
+    get_db,
+    get_read_db,
+    replicas,
+)
+from app.auth import (
+    check_can_upsert,
+    create_zoho_client,
+    get_admin_user,
+    is_verified_admin,
+    get_zoho_user,
+    token_cache,
+)
 
 load_dotenv()
-app = FastAPI()
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    schema.check_schema(engine)
+    app.state.zoho_client = create_zoho_client()
+    try:
+        with Session() as db:
+            roles.refresh(db)
+            skills.refresh(db)
+    except OperationalError as exc:
+        # Both caches start out expired and load on first use instead.
+        logger.warning("Catalog warm-up skipped: %s", exc.orig)
+    metrics.startup_duration.set("lifespan", value=time.perf_counter() - started)
+    yield
+    await app.state.zoho_client.aclose()
+    if async_engine is not None:
+        await async_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(profiler.ProfilerMiddleware, trusted=is_verified_admin)
+app.add_middleware(admission.AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        NEXT_CURSOR_HEADER,
+        "ETag",
+        profiler.QUERIES_HEADER,
+        profiler.TIME_HEADER,
+    ],
 )
+app.add_middleware(compression.CompressionMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_exception_handler(etag.CachedResponse, etag.cached_response_handler)
 
-oauth2_scheme = OAuth2()
+# Core CRUD endpoints; with DB_ASYNC the event-loop versions in app.async_api
+# are mounted in their place.
+sync_api = APIRouter()
 
 
-@app.middleware("http")
-async def db_session_middleware(request: Request, call_next):
-    response = Response("Internal server error", status_code=500)
-    try:
-        request.state.db = Session()
-        response = await call_next(request)
-    finally:
-        request.state.db.close()
-    return response
-
-
-@app.get("/roles/", response_model=list[schemas.Role])
+@sync_api.get("/roles/", response_model=list[schemas.Role])
 def read_roles(
+    response: Response,
     # token: Annotated[str, Depends(oauth2_scheme)],
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: str | None = None,
+    tag: str = Depends(etag.conditional("roles", etag.roles_version)),
+    db: Session = Depends(get_read_db),
 ):
     # if not get_current_user(db=db, token=token):
     #     return HTTPException(status_code=401, detail="Invalid credentials")
-    roles = crud.get_roles(db, skip=skip, limit=limit)
-    return roles
+    roles_page = roles.current(db).page(
+        skip=skip, limit=limit, after=decode_id_cursor(cursor)
+    )
+    set_next_cursor(response, roles_page, limit)
+    return etag.render(
+        tag,
+        response,
+        serializers.dumps([serializers.role_dict(role) for role in roles_page]),
+    )
 
 
-@app.post("/roles/", response_model=schemas.Role)
+@sync_api.post("/roles/", response_model=schemas.Role)
 def create_role(
     role: schemas.RoleBase,
     db: Session = Depends(get_db),
 ):
-    db_role = crud.get_role_by_role(db=db, role=role.role)
-    if db_role:
+    if roles.current(db).get_by_name(role.role):
+        raise HTTPException(status_code=400, detail="Role name already registered")
+    try:
+        return crud.create_role(db=db, role=role)
+    except IntegrityError:
+        # Created by another worker since this one last loaded the catalog.
         raise HTTPException(status_code=400, detail="Role name already registered")
-    return crud.create_role(db=db, role=role)
 
 
-@app.get("/users/", response_model=list[schemas.User])
+@sync_api.get("/users/", response_model=list[schemas.User])
 def read_users(
-    token: Annotated[str, Depends(oauth2_scheme)],
+    response: Response,
+    current_user: Annotated[schemas.User, Depends(get_zoho_user)],
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: str | None = None,
+    fields: str | None = None,
+    tag: str = Depends(etag.conditional("users", etag.users_version)),
+    db: Session = Depends(get_read_db),
+):
+    users = crud.get_user_dicts(
+        db,
+        skip=skip,
+        limit=limit,
+        after=decode_id_cursor(cursor),
+        fields=crud.parse_user_fields(fields),
+    )
+    set_next_cursor(response, users, limit)
+    return etag.render(tag, response, serializers.dumps(users))
+
+
+@sync_api.get("/users/search", response_model=list[schemas.User])
+def search_users(
+    current_user: Annotated[schemas.User, Depends(get_zoho_user)],
+    q: Annotated[str, Query(min_length=3, max_length=100)],
+    limit: Annotated[int, Query(ge=1, le=50)] = 20,
+    db: Session = Depends(get_read_db),
+):
+    return crud.search_users(db, q=q, limit=limit)
+
+
+@sync_api.get("/users/changes", response_model=schemas.UserChanges)
+def read_user_changes(
+    current_user: Annotated[schemas.User, Depends(get_zoho_user)],
+    since: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=changes.CHANGES_MAX_LIMIT)] = 100,
+    db: Session = Depends(get_read_db),
+):
+    feed = crud.get_user_changes(db, since=changes.decode_token(since), limit=limit)
+    return Response(serializers.dumps(feed), media_type="application/json")
+
+
+@sync_api.post("/users/batch", response_model=schemas.UserBatchResult)
+def lookup_users(
+    current_user: Annotated[schemas.User, Depends(get_zoho_user)],
+    lookup: schemas.UserBatchLookup,
+    db: Session = Depends(get_read_db),
 ):
-    print(verify_zoho_user(token=token, db=db))
-    users = crud.get_users(db, skip=skip, limit=limit)
-    return users
+    keys = crud.batch_lookup_keys(lookup)
+    users = crud.get_user_dicts_by(db, lookup.by, list(keys)) if keys else []
+    return Response(
+        serializers.dumps(crud.batch_lookup_result(lookup.by, keys, users)),
+        media_type="application/json",
+    )
 
 
-@app.post("/users/", response_model=schemas.User)
+@sync_api.post("/users/", response_model=schemas.User)
 def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, email=user.email)
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    db_user = crud.get_user_by_badge_number(db, badge_number=user.badge_number)
-    if db_user:
-        raise HTTPException(status_code=400, detail="Badge number already registered")
-    for role_id in user.roles:
-        db_role = crud.get_role_by_id(db=db, role_id=role_id)
-        if not db_role:
-            raise HTTPException(
-                status_code=400, detail=f"Role with id {role_id} does not exist"
-            )
-    return crud.create_user(db=db, user=user)
+    missing = roles.missing_role_ids(db, user.roles)
+    if missing:
+        raise HTTPException(
+            status_code=400, detail=f"Role with id {missing[0]} does not exist"
+        )
+    try:
+        return crud.create_user(db=db, user=user)
+    except IntegrityError as exc:
+        raise HTTPException(status_code=400, detail=crud.integrity_error_detail(exc))
+
+
+@sync_api.put("/users/", response_model=schemas.User)
+def upsert_user(
+    user: schemas.UserCreate,
+    current_user: Annotated[schemas.User, Depends(get_zoho_user)],
+    db: Session = Depends(get_db),
+):
+    check_can_upsert(current_user, user)
+    missing = roles.missing_role_ids(db, user.roles)
+    if missing:
+        raise HTTPException(
+            status_code=400, detail=f"Role with id {missing[0]} does not exist"
+        )
+    try:
+        return crud.upsert_user(db=db, user=user)
+    except IntegrityError as exc:
+        raise HTTPException(status_code=400, detail=crud.integrity_error_detail(exc))
+
+
+app.include_router(async_api.router if DB_ASYNC else sync_api)
+
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# Cache, pool and profiler internals, slow-query SQL included: admins only.
+internal_api = APIRouter(prefix="/internal", dependencies=[Depends(get_admin_user)])
+
+
+@internal_api.get("/auth-cache")
+def read_auth_cache_stats():
+    return token_cache.stats()
+
+
+@internal_api.get("/role-cache")
+def read_role_cache_stats():
+    return roles.role_cache.stats()
+
+
+@internal_api.get("/skill-index")
+def read_skill_index_stats():
+    return skills.skill_index.stats()
+
+
+@internal_api.get("/admission")
+def read_admission_stats():
+    return admission.stats()
+
+
+@internal_api.get("/slow-queries")
+def read_slow_queries():
+    return profiler.stats()
+
+
+@internal_api.get("/pool")
+def read_pool_stats():
+    stats = {"primary": pool_stats(engine), "replicas": replicas.stats()}
+    if async_engine is not None:
+        stats["async"] = pool_stats(async_engine.sync_engine)
+        stats["async_replicas"] = async_replicas.stats()
+    return stats
+
+
+app.include_router(internal_api)
+
+
+@app.post("/users/import", response_model=schemas.UserImportResult)
+async def import_users(
+    current_user: Annotated[schemas.User, Depends(get_zoho_user)],
+    request: Request,
+    db: Session = Depends(get_db),
+):
+    csv_format = request.headers.get("content-type", "").startswith("text/csv")
+    return await importer.import_users(db, request.stream(), csv_format=csv_format)
+
+
+@app.get("/users/export")
+def export_users(
+    current_user: Annotated[schemas.User, Depends(get_zoho_user)],
+    format: Literal["ndjson", "csv"] = "ndjson",
+):
+    csv_format = format == "csv"
+    return StreamingResponse(
+        exporter.export_users(csv_format=csv_format),
+        media_type="text/csv" if csv_format else "application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename=users.{format}"},
+    )
 
 
 # @app.post("/login", response_model=schemas.Token)
@@ -119,66 +338,162 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
 #     return current_user
 
 
-# @app.get("/employees/", response_model=list[schemas.Employee])
-# def read_employees(
-#     token: Annotated[str, Depends(oauth2_scheme)],
-#     skip: int = 0,
-#     limit: int = 100,
-#     db: Session = Depends(get_db),
-# ):
-#     if not get_current_user(db=db, token=token):
-#         return HTTPException(status_code=401, detail="Invalid credentials")
-#     employees = crud.get_employees(db, skip=skip, limit=limit)
-#     return employees
+@app.get("/employees/", response_model=list[schemas.Employee])
+def read_employees(
+    current_user: Annotated[schemas.User, Depends(get_zoho_user)],
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_read_db),
+):
+    return crud.get_employees(db, skip=skip, limit=limit)
 
 
-# @app.post("/employees/", response_model=schemas.Employee)
-# def create_employee(
-#     token: Annotated[str, Depends(oauth2_scheme)],
-#     employee: schemas.EmployeeCreate,
-#     db: Session = Depends(get_db),
-# ):
-#     current_user = get_current_user(db=db, token=token)
-#     if not current_user:
-#         return HTTPException(status_code=401, detail="Invalid credentials")
-#     db_employee = crud.get_employee_by_user_id(db=db, user_id=current_user.id)
-#     if db_employee:
-#         raise HTTPException(
-#             status_code=400,
-#             detail=f"Employee with user id {current_user.id} already registered",
-#         )
-#     for manager_id in employee.managers:
-#         db_manager = crud.get_user_by_id(db=db, user_id=manager_id)
-#         if not db_manager:
-#             raise HTTPException(
-#                 status_code=400, detail=f"Manager with id {manager_id} does not exist"
-#             )
-#         if manager_id == current_user.id:
-#             raise HTTPException(
-#                 status_code=400,
-#                 detail=f"Employee cannot be their own manager",
-#             )
-#     return crud.create_employee(db=db, employee=employee, current_user=current_user)
-
-
-# @app.patch("/employees/{employee_id}", response_model=schemas.Employee)
-# def patch_employee(
-#     token: Annotated[str, Depends(oauth2_scheme)],
-#     employee_id: str,
-#     employee: schemas.EmployeeCreate,
-#     db: Session = Depends(get_db),
-# ):
-#     current_user = get_current_user(db=db, token=token)
-#     if not current_user:
-#         return HTTPException(status_code=401, detail="Invalid credentials")
-#     db_employee = crud.get_employee_by_id(db=db, employee_id=employee_id)
-#     if not db_employee:
-#         raise HTTPException(
-#             status_code=404, detail=f"Employee with id {employee_id} does not exist"
-#         )
-#     if db_employee.user_id != current_user.id:
-#         raise HTTPException(
-#             status_code=401,
-#             detail=f"Employee with id {employee_id} does not belong to current user",
-#         )
-#     return crud.patch_employee(db=db, employee_id=employee_id, employee=employee)
+def check_managers(db: Session, user_id: UUID, manager_ids: list[UUID]):
+    missing = crud.missing_user_ids(db, manager_ids)
+    if missing:
+        raise HTTPException(
+            status_code=400, detail=f"Manager with id {missing[0]} does not exist"
+        )
+    if user_id in manager_ids:
+        raise HTTPException(
+            status_code=400, detail="Employee cannot be their own manager"
+        )
+
+
+@app.get("/employees/search", response_model=schemas.SkillSearchResult)
+def search_employees_by_skill(
+    current_user: Annotated[schemas.User, Depends(get_zoho_user)],
+    language: Annotated[list[str], Query()] = [],
+    framework: Annotated[list[str], Query()] = [],
+    server: Annotated[list[str], Query()] = [],
+    match: Literal["any", "all"] = "any",
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_read_db),
+):
+    employee_ids, total, facets = skills.current(db).search(
+        {"language": language, "framework": framework, "server": server},
+        match_all=match == "all",
+        skip=skip,
+        limit=limit,
+    )
+    return {
+        "total": total,
+        "employees": crud.get_employees_by_ids(db, employee_ids),
+        "facets": facets,
+    }
+
+
+@app.post("/employees/", response_model=schemas.Employee)
+def create_employee(
+    current_user: Annotated[schemas.User, Depends(get_zoho_user)],
+    employee: schemas.EmployeeCreate,
+    db: Session = Depends(get_db),
+):
+    db_employee = crud.get_employee_by_user_id(db=db, user_id=current_user.id)
+    if db_employee:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Employee with user id {current_user.id} already registered",
+        )
+    check_managers(db, current_user.id, employee.managers)
+    try:
+        return crud.create_employee(db=db, employee=employee, current_user=current_user)
+    except hierarchy.ManagerCycleError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.patch("/employees/{employee_id}", response_model=schemas.Employee)
+def patch_employee(
+    current_user: Annotated[schemas.User, Depends(get_zoho_user)],
+    employee_id: UUID,
+    employee: schemas.EmployeeCreate,
+    db: Session = Depends(get_db),
+):
+    db_employee = crud.get_employee_by_id(db=db, employee_id=employee_id)
+    if not db_employee:
+        raise HTTPException(
+            status_code=404, detail=f"Employee with id {employee_id} does not exist"
+        )
+    if db_employee.user_id != current_user.id:
+        raise HTTPException(
+            status_code=401,
+            detail=f"Employee with id {employee_id} does not belong to current user",
+        )
+    if "managers" in employee.model_fields_set:
+        check_managers(db, db_employee.user_id, employee.managers)
+    try:
+        return crud.patch_employee(db=db, db_employee=db_employee, employee=employee)
+    except hierarchy.ManagerCycleError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.post("/employees/{employee_id}/experiences", response_model=schemas.Experience)
+def create_experience(
+    current_user: Annotated[schemas.User, Depends(get_zoho_user)],
+    employee_id: UUID,
+    experience: schemas.ExperienceCreate,
+    db: Session = Depends(get_db),
+):
+    db_employee = crud.get_employee_by_id(db=db, employee_id=employee_id)
+    if not db_employee:
+        raise HTTPException(
+            status_code=404, detail=f"Employee with id {employee_id} does not exist"
+        )
+    if db_employee.user_id != current_user.id:
+        raise HTTPException(
+            status_code=401,
+            detail=f"Employee with id {employee_id} does not belong to current user",
+        )
+    try:
+        return crud.create_experience(
+            db=db, employee_id=employee_id, experience=experience
+        )
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail="Skill does not exist")
+
+
+@app.get("/skills/{facet}", response_model=list[schemas.Skill])
+def read_skills(
+    facet: Literal["language", "framework", "server"],
+    db: Session = Depends(get_read_db),
+):
+    return skills.current(db).skills(facet)
+
+
+@app.post("/skills/{facet}", response_model=schemas.Skill)
+def create_skill(
+    current_user: Annotated[schemas.User, Depends(get_admin_user)],
+    facet: Literal["language", "framework", "server"],
+    skill: schemas.SkillCreate,
+    db: Session = Depends(get_db),
+):
+    if skills.current(db).has_name(facet, skill.name):
+        raise HTTPException(status_code=400, detail="Skill already registered")
+    return crud.create_skill(db=db, facet=facet, skill=skill)
+
+
+@app.get("/users/{user_id}/reports", response_model=list[schemas.HierarchyEntry])
+def read_reports(
+    current_user: Annotated[schemas.User, Depends(get_zoho_user)],
+    user_id: UUID,
+    max_depth: int | None = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_read_db),
+):
+    rows = crud.get_reports(db, user_id, max_depth=max_depth, skip=skip, limit=limit)
+    return [{"user": user, "depth": depth} for user, depth in rows]
+
+
+@app.get("/users/{user_id}/managers", response_model=list[schemas.HierarchyEntry])
+def read_managers(
+    current_user: Annotated[schemas.User, Depends(get_zoho_user)],
+    user_id: UUID,
+    db: Session = Depends(get_read_db),
+):
+    rows = crud.get_managers(db, user_id)
+    return [{"user": user, "depth": depth} for user, depth in rows]
+
+
+metrics.startup_duration.set("import", value=time.perf_counter() - _import_started)
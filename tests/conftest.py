@@ -0,0 +1,120 @@
+"""Shared fixtures. The tests need a real Postgres server: DB_USER, DB_PASS,
+DB_HOST and DB_PORT are read as usual and TEST_DB_NAME (default
+employee_test) names a database the suite may wipe; it is created, with the
+app's tables, when it does not exist. Without a server every test is skipped.
+"""
+
+import os
+
+# Before anything from the app is imported: module-level settings read these.
+os.environ["DB_NAME"] = os.getenv("TEST_DB_NAME", "employee_test")
+os.environ["DB_SCHEMA_CHECK"] = "create_all"
+os.environ["RESPONSE_CACHE_TTL"] = "0"
+os.environ["RATE_LIMIT_PER_SECOND"] = "0"
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+import main
+from app import auth, crud, database, etag, models, roles, schemas, skills
+
+
+def _ensure_database(db_name: str):
+    admin = create_engine(
+        f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASS')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/postgres",
+        isolation_level="AUTOCOMMIT",
+    )
+    try:
+        with admin.connect() as conn:
+            exists = conn.scalar(
+                text("SELECT 1 FROM pg_database WHERE datname = :name"),
+                {"name": db_name},
+            )
+            if not exists:
+                conn.execute(text(f'CREATE DATABASE "{db_name}"'))
+    finally:
+        admin.dispose()
+
+
+@pytest.fixture(scope="session")
+def postgres():
+    try:
+        _ensure_database(os.environ["DB_NAME"])
+    except OperationalError as exc:
+        pytest.skip(f"Postgres unavailable: {exc.orig}")
+    models.Base.metadata.create_all(bind=database.engine)
+
+
+@pytest.fixture(autouse=True)
+def clean_database(postgres):
+    tables = ", ".join(t.name for t in models.Base.metadata.sorted_tables)
+    with database.engine.begin() as conn:
+        conn.execute(text(f"TRUNCATE {tables} CASCADE"))
+    auth.token_cache.clear()
+    etag.response_cache.clear()
+    zoho_calls.clear()
+    with database.Session() as db:
+        roles.refresh(db)
+        skills.refresh(db)
+
+
+# Tokens the fake Zoho was asked about, in order; emptied for every test.
+zoho_calls: list[str] = []
+
+
+def fake_zoho(request: httpx.Request):
+    # "Bearer <email>" is that user's token; anything else is rejected.
+    zoho_calls.append(request.headers["Authorization"])
+    token = request.headers["Authorization"].removeprefix("Bearer ")
+    if "@" not in token:
+        return httpx.Response(401)
+    return httpx.Response(200, json={"Email": token})
+
+
+@pytest.fixture(scope="session")
+def client(postgres):
+    with TestClient(main.app) as client:
+        main.app.state.zoho_client = httpx.AsyncClient(
+            transport=httpx.MockTransport(fake_zoho)
+        )
+        yield client
+
+
+@pytest.fixture
+def api_engine(postgres):
+    """The engine serving the core endpoints (app.async_api with DB_ASYNC)."""
+    if database.async_engine is not None:
+        return database.async_engine.sync_engine
+    return database.engine
+
+
+def auth_headers(email: str):
+    return {"Authorization": f"Bearer {email}"}
+
+
+@pytest.fixture
+def make_role(postgres):
+    def make_role(name: str):
+        with database.Session() as db:
+            role = crud.create_role(db, schemas.RoleBase(role=name))
+            return schemas.Role.model_validate(role, from_attributes=True)
+
+    return make_role
+
+
+@pytest.fixture
+def make_user(postgres):
+    def make_user(name: str, roles=()):
+        user = schemas.UserCreate(
+            name=name,
+            email=f"{name.lower()}@example.com",
+            badge_number=name.upper(),
+            roles=[role.id for role in roles],
+        )
+        with database.Session() as db:
+            return crud.create_user(db, user)
+
+    return make_user
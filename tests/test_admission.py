@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.responses import PlainTextResponse
+
+from app import admission
+
+from .conftest import auth_headers
+
+
+async def ok(scope, receive, send):
+    await PlainTextResponse("ok")(scope, receive, send)
+
+
+@pytest.fixture
+def limited(monkeypatch):
+    """A client through an AdmissionMiddleware allowing a burst of two."""
+    monkeypatch.setattr(admission, "RATE_LIMIT_PER_SECOND", 0.5)
+    monkeypatch.setattr(admission, "RATE_LIMIT_BURST", 2)
+    monkeypatch.setattr(admission, "admission_gates", {})
+    return TestClient(admission.AdmissionMiddleware(ok))
+
+
+def test_route_classes():
+    assert admission.route_class("GET", "/users/") == "read"
+    assert admission.route_class("POST", "/users/batch") == "read"
+    assert admission.route_class("POST", "/users/") == "write"
+    assert admission.route_class("PUT", "/users/batch") == "write"
+    assert admission.route_class("POST", "/users/import") == "bulk"
+    assert admission.route_class("GET", "/internal/pool") is None
+
+
+def test_empty_bucket_answers_429(limited):
+    assert [limited.get("/users/").status_code for _ in range(2)] == [200, 200]
+
+    response = limited.get("/users/")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+    # Exempt paths are never counted.
+    assert limited.get("/internal/pool").status_code == 200
+
+
+def test_only_verified_tokens_get_their_own_bucket(client, make_user, limited):
+    alice = auth_headers(make_user("Alice").email)
+    client.get("/users/", headers=alice)  # verifies and caches the token
+
+    for _ in range(2):
+        assert limited.get("/users/", headers=alice).status_code == 200
+    assert limited.get("/users/", headers=alice).status_code == 429
+
+    # Made-up tokens do not get fresh buckets: they share the address's.
+    made_up = [{"Authorization": f"Bearer fake-{i}"} for i in range(3)]
+    assert [limited.get("/", headers=h).status_code for h in made_up] == [
+        200,
+        200,
+        429,
+    ]
+
+
+def test_full_gate_answers_503(monkeypatch):
+    gate = admission.Gate(limit=1, queue_size=0, timeout=0.1)
+    monkeypatch.setattr(admission, "admission_gates", {})
+    middleware = admission.AdmissionMiddleware(ok)
+    middleware.gates["read"] = gate
+
+    assert asyncio.run(gate.acquire())  # one request holds the only slot
+    response = TestClient(middleware).get("/users/")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(admission.ADMISSION_RETRY_AFTER)
@@ -0,0 +1,59 @@
+import asyncio
+
+import httpx
+
+from app import auth
+
+from .conftest import auth_headers, zoho_calls
+
+
+def test_token_is_verified_once(client, make_user):
+    user = make_user("Alice")
+    headers = auth_headers(user.email)
+
+    for _ in range(3):
+        assert client.get("/users/", headers=headers).status_code == 200
+    assert zoho_calls == [f"Bearer {user.email}"]
+
+
+def test_unknown_token_is_rejected(client):
+    response = client.get("/users/", headers={"Authorization": "Bearer nobody"})
+    assert response.status_code == 401
+
+
+def test_concurrent_verifications_share_one_zoho_call(postgres):
+    calls = []
+
+    async def slow_zoho(request):
+        calls.append(request.headers["Authorization"])
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"Email": "alice@example.com"})
+
+    async def load_user(email):
+        return email
+
+    async def verify_concurrently():
+        transport = httpx.MockTransport(slow_zoho)
+        async with httpx.AsyncClient(transport=transport) as zoho:
+            return await asyncio.gather(
+                *(
+                    auth.verify_zoho_user_async("Bearer alice", zoho, load_user)
+                    for _ in range(10)
+                )
+            )
+
+    assert asyncio.run(verify_concurrently()) == ["alice@example.com"] * 10
+    assert calls == ["Bearer alice"]
+
+
+def test_writes_forget_the_cached_user(client, make_user):
+    user = make_user("Alice")
+    headers = auth_headers(user.email)
+    client.get("/users/", headers=headers)
+
+    changed = {"name": "Alice B.", "email": user.email, "badge_number": "ALICE"}
+    assert client.put("/users/", headers=headers, json=changed).status_code == 200
+    # The cached snapshot still said "Alice"; the next request re-verifies.
+    client.get("/users/", headers=headers)
+    assert len(zoho_calls) == 2
+    assert auth.token_cache.get(headers["Authorization"])[1].name == "Alice B."
@@ -0,0 +1,87 @@
+from sqlalchemy import insert
+
+from app import database, models
+
+from .conftest import auth_headers
+
+
+def fetch(client, headers, since=None, limit=100):
+    params = {"limit": limit} | ({"since": since} if since else {})
+    response = client.get("/users/changes", params=params, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def emails(feed):
+    return sorted(user["email"] for user in feed["users"])
+
+
+def test_first_call_returns_everything(client, make_role, make_user):
+    staff = make_role("Staff")
+    alice = make_user("Alice", roles=[staff])
+    make_user("Bob")
+
+    feed = fetch(client, auth_headers(alice.email))
+    assert emails(feed) == ["alice@example.com", "bob@example.com"]
+    assert [role["role"] for role in feed["roles"]] == ["Staff"]
+    assert not feed["more"]
+    assert fetch(client, auth_headers(alice.email), feed["next"])["users"] == []
+
+
+def test_token_picks_up_only_later_writes(client, make_role, make_user):
+    admin, staff = make_role("admin"), make_role("Staff")
+    alice = make_user("Alice", roles=[admin])
+    headers = auth_headers(alice.email)
+    token = fetch(client, headers)["next"]
+
+    bob = make_user("Bob")
+    feed = fetch(client, headers, token)
+    assert emails(feed) == ["bob@example.com"]
+    token = feed["next"]
+
+    # Repeating a PUT writes nothing, so nothing new shows up.
+    same = {"name": "Bob", "email": bob.email, "badge_number": "BOB"}
+    assert client.put("/users/", headers=headers, json=same).status_code == 200
+    assert fetch(client, headers, token)["users"] == []
+
+    # A role change alone is reported through the user.
+    promoted = same | {"roles": [str(staff.id)]}
+    assert client.put("/users/", headers=headers, json=promoted).status_code == 200
+    feed = fetch(client, headers, token)
+    assert emails(feed) == ["bob@example.com"]
+    assert [role["role"] for role in feed["users"][0]["roles"]] == ["Staff"]
+
+
+def test_pages_cover_every_change_once(client, make_user):
+    users = [make_user(f"User{i}") for i in range(5)]
+    headers = auth_headers(users[0].email)
+
+    seen, token, more = [], None, True
+    while more:
+        feed = fetch(client, headers, token, limit=2)
+        seen += emails(feed)
+        token, more = feed["next"], feed["more"]
+    assert sorted(seen) == sorted(user.email for user in users)
+
+
+def test_slow_writer_is_not_skipped(client, make_user):
+    alice = make_user("Alice")
+    headers = auth_headers(alice.email)
+    token = fetch(client, headers)["next"]
+
+    # A transaction that takes its id first but commits last.
+    with database.engine.connect() as slow:
+        slow.execute(
+            insert(models.User).values(
+                name="Slow", email="slow@example.com", badge_number="SLOW"
+            )
+        )
+        make_user("Fast")
+        feed = fetch(client, headers, token)
+        # Fast's version is above the open transaction's, so it is held back
+        # rather than letting the token move past Slow.
+        assert feed["users"] == []
+        slow.commit()
+
+    feed = fetch(client, headers, feed["next"])
+    assert emails(feed) == ["fast@example.com", "slow@example.com"]
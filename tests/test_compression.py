@@ -0,0 +1,73 @@
+import gzip
+
+import brotli
+import pytest
+
+from app.compression import negotiate
+
+from .conftest import auth_headers
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        ("gzip, deflate, br", "br"),
+        ("gzip", "gzip"),
+        ("br;q=0.5, gzip", "gzip"),
+        ("*", "br"),
+        ("identity", None),
+        ("br;q=0, gzip;q=0", None),
+        ("", None),
+    ],
+)
+def test_negotiate(accept_encoding, expected):
+    assert negotiate(accept_encoding) == expected
+
+
+def raw_get(client, path, accept_encoding, headers=None):
+    """The response and its body exactly as sent, without httpx decoding it."""
+    headers = (headers or {}) | {"Accept-Encoding": accept_encoding}
+    with client.stream("GET", path, headers=headers) as response:
+        return response, b"".join(response.iter_raw())
+
+
+@pytest.fixture
+def users_headers(make_user):
+    users = [make_user(f"User{i}") for i in range(20)]
+    return auth_headers(users[0].email)
+
+
+@pytest.mark.parametrize(
+    "coding, decompress", [("gzip", gzip.decompress), ("br", brotli.decompress)]
+)
+def test_large_bodies_are_compressed(client, users_headers, coding, decompress):
+    plain, plain_body = raw_get(client, "/users/", "identity", users_headers)
+    assert "content-encoding" not in plain.headers
+    assert len(plain_body) > 1024
+
+    response, body = raw_get(client, "/users/", coding, users_headers)
+    assert response.headers["content-encoding"] == coding
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) == len(body) < len(plain_body)
+    assert decompress(body) == plain_body
+
+
+def test_streamed_bodies_are_compressed(client, users_headers):
+    plain, plain_body = raw_get(client, "/users/export", "identity", users_headers)
+
+    response, body = raw_get(client, "/users/export", "gzip", users_headers)
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert gzip.decompress(body) == plain_body
+
+
+def test_small_and_empty_bodies_pass_through(client, users_headers):
+    response, body = raw_get(client, "/roles/", "gzip")
+    assert "content-encoding" not in response.headers
+    assert body == b"[]"
+
+    tag = response.headers["ETag"]
+    response, body = raw_get(client, "/roles/", "gzip", {"If-None-Match": tag})
+    assert response.status_code == 304
+    assert "content-encoding" not in response.headers
+    assert body == b""
@@ -0,0 +1,75 @@
+import pytest
+
+from app import etag
+from app.testing import assert_num_queries
+
+from .conftest import auth_headers
+
+
+def test_matching_tag_answers_304(client, make_user):
+    headers = auth_headers(make_user("Alice").email)
+    first = client.get("/users/", headers=headers)
+    tag = first.headers["ETag"]
+    assert tag.startswith('W/"')
+
+    again = client.get("/users/", headers=headers | {"If-None-Match": tag})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == tag
+    assert again.content == b""
+
+    # The query is part of the tag: another page is another representation.
+    other = client.get("/users/", params={"limit": 1}, headers=headers)
+    assert other.headers["ETag"] != tag
+
+
+def test_a_write_changes_the_users_tag(client, make_role, make_user):
+    alice = make_user("Alice", roles=[make_role("admin")])
+    headers = auth_headers(alice.email)
+    tag = client.get("/users/", headers=headers).headers["ETag"]
+
+    bob = {"name": "Bob", "email": "bob@example.com", "badge_number": "BOB"}
+    assert client.put("/users/", headers=headers, json=bob).status_code == 200
+    response = client.get("/users/", headers=headers | {"If-None-Match": tag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != tag
+    assert len(response.json()) == 2
+
+    # Repeating the same PUT writes nothing, so the tag holds.
+    tag = response.headers["ETag"]
+    assert client.put("/users/", headers=headers, json=bob).status_code == 200
+    again = client.get("/users/", headers=headers | {"If-None-Match": tag})
+    assert again.status_code == 304
+
+
+def test_a_new_role_changes_the_roles_tag(client, make_role):
+    make_role("Staff")
+    tag = client.get("/roles/").headers["ETag"]
+    assert client.get("/roles/", headers={"If-None-Match": tag}).status_code == 304
+
+    assert client.post("/roles/", json={"role": "Admin"}).status_code == 200
+    response = client.get("/roles/", headers={"If-None-Match": tag})
+    assert response.status_code == 200
+    assert sorted(role["role"] for role in response.json()) == ["Admin", "Staff"]
+
+
+@pytest.fixture
+def response_cache(monkeypatch):
+    monkeypatch.setattr(etag, "RESPONSE_CACHE_TTL", 5)
+    monkeypatch.setattr(etag.response_cache, "ttl", 5)
+    return etag.response_cache
+
+
+def test_cached_body_costs_only_the_version_lookup(
+    client, api_engine, make_user, response_cache
+):
+    headers = auth_headers(make_user("Alice").email)
+    first = client.get("/users/", headers=headers)
+
+    with assert_num_queries(api_engine, 1):
+        cached = client.get("/users/", headers=headers)
+    assert cached.content == first.content
+    assert cached.headers["ETag"] == first.headers["ETag"]
+
+    # A new user moves the version, so the cached body is not served.
+    make_user("Bob")
+    assert len(client.get("/users/", headers=headers).json()) == 2
@@ -0,0 +1,40 @@
+from .conftest import auth_headers
+
+
+def test_fields_pick_the_keys_sent(client, make_role, make_user):
+    staff = make_role("Staff")
+    alice = make_user("Alice", roles=[staff])
+    headers = auth_headers(alice.email)
+
+    response = client.get("/users/", params={"fields": "name"}, headers=headers)
+    assert response.status_code == 200
+    # "id" always comes along: the next cursor is built from it.
+    assert response.json() == [{"name": "Alice", "id": str(alice.id)}]
+
+    response = client.get("/users/", params={"fields": "roles, email"}, headers=headers)
+    assert response.json() == [
+        {
+            "email": "alice@example.com",
+            "id": str(alice.id),
+            "roles": [{"role": "Staff", "id": str(staff.id)}],
+        }
+    ]
+
+
+def test_without_fields_every_key_is_sent(client, make_user):
+    alice = make_user("Alice")
+
+    response = client.get("/users/", headers=auth_headers(alice.email))
+    assert set(response.json()[0]) == {"name", "email", "badge_number", "id", "roles"}
+
+
+def test_unknown_fields_are_rejected(client, make_user):
+    alice = make_user("Alice")
+
+    response = client.get(
+        "/users/",
+        params={"fields": "name,password,salary"},
+        headers=auth_headers(alice.email),
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown fields: password, salary"
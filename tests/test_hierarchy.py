@@ -0,0 +1,72 @@
+import pytest
+
+from .conftest import auth_headers
+
+
+@pytest.fixture
+def org(client, make_user):
+    """ceo <- vp <- eng, plus ops under the ceo; returns users and employees."""
+    users = {name: make_user(name) for name in ("Ceo", "Vp", "Eng", "Ops")}
+    employees = {}
+    for name, manager in (("Ceo", None), ("Vp", "Ceo"), ("Eng", "Vp"), ("Ops", "Ceo")):
+        managers = [str(users[manager].id)] if manager else []
+        response = client.post(
+            "/employees/",
+            headers=auth_headers(users[name].email),
+            json={"managers": managers},
+        )
+        assert response.status_code == 200
+        employees[name] = response.json()["id"]
+    return users, employees
+
+
+def chain(client, users, path, viewer="Ceo", **params):
+    response = client.get(
+        path, params=params, headers=auth_headers(users[viewer].email)
+    )
+    assert response.status_code == 200
+    return [(entry["user"]["name"], entry["depth"]) for entry in response.json()]
+
+
+def test_reports_at_every_depth(client, org):
+    users, _ = org
+    reports = f"/users/{users['Ceo'].id}/reports"
+
+    assert chain(client, users, reports) == [("Ops", 1), ("Vp", 1), ("Eng", 2)]
+    assert chain(client, users, reports, max_depth=1) == [("Ops", 1), ("Vp", 1)]
+    assert chain(client, users, f"/users/{users['Eng'].id}/reports") == []
+
+
+def test_management_chain(client, org):
+    users, _ = org
+
+    managers = f"/users/{users['Eng'].id}/managers"
+    assert chain(client, users, managers) == [("Vp", 1), ("Ceo", 2)]
+
+
+def test_moving_a_manager_moves_their_reports(client, org):
+    users, employees = org
+
+    response = client.patch(
+        f"/employees/{employees['Vp']}",
+        headers=auth_headers(users["Vp"].email),
+        json={"managers": [str(users["Ops"].id)]},
+    )
+    assert response.status_code == 200
+    managers = f"/users/{users['Eng'].id}/managers"
+    assert chain(client, users, managers) == [("Vp", 1), ("Ops", 2), ("Ceo", 3)]
+    reports = f"/users/{users['Ops'].id}/reports"
+    assert chain(client, users, reports) == [("Vp", 1), ("Eng", 2)]
+
+
+def test_cycles_are_rejected(client, org):
+    users, employees = org
+
+    response = client.patch(
+        f"/employees/{employees['Ceo']}",
+        headers=auth_headers(users["Ceo"].email),
+        json={"managers": [str(users["Eng"].id)]},
+    )
+    assert response.status_code == 400
+    reports = f"/users/{users['Ceo'].id}/reports"
+    assert chain(client, users, reports) == [("Ops", 1), ("Vp", 1), ("Eng", 2)]
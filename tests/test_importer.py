@@ -0,0 +1,120 @@
+from sqlalchemy import select
+
+from app import database, importer, models
+
+from .conftest import auth_headers
+
+HEADER = "name,email,badge_number,roles\n"
+
+
+def upload(client, headers, body, csv_format=True):
+    content_type = "text/csv" if csv_format else "application/x-ndjson"
+    return client.post(
+        "/users/import",
+        headers=headers | {"Content-Type": content_type},
+        content=body.encode(),
+    )
+
+
+def stored_names():
+    with database.Session() as db:
+        return sorted(db.scalars(select(models.User.name)))
+
+
+def test_quoted_field_may_span_lines(client, make_user):
+    headers = auth_headers(make_user("Alice").email)
+    body = (
+        HEADER
+        + '"Bob\nSmith",bob@example.com,BOB,\n'
+        + "Carol,carol@example.com,CAROL,\n"
+    )
+
+    response = upload(client, headers, body)
+    assert response.json() == {"created": 2, "errors": []}
+    assert stored_names() == ["Alice", "Bob\nSmith", "Carol"]
+
+
+def test_stray_quote_is_a_literal_character(client, make_user):
+    headers = auth_headers(make_user("Alice").email)
+    body = (
+        HEADER
+        + 'A b"c,ab@example.com,ABC,\n'
+        + "Bob,bob@example.com,BOB,\n"
+        + '"Carol ""C""",carol@example.com,CAROL,\n'
+    )
+
+    response = upload(client, headers, body)
+    assert response.json() == {"created": 3, "errors": []}
+    assert stored_names() == ['A b"c', "Alice", "Bob", 'Carol "C"']
+
+
+def test_bad_rows_are_reported_by_line(client, make_user):
+    headers = auth_headers(make_user("Alice").email)
+    body = (
+        HEADER
+        + "Alice,alice@example.com,OTHER,\n"
+        + "Bob,bob@example.com,BOB,\n"
+        + "Bob Again,bob@example.com,BOB2,\n"
+        + "Carol,not-an-email,CAROL\n"
+        + '"Dave\n'
+        + "Dave,dave@example.com,DAVE,\n"
+    )
+
+    result = upload(client, headers, body).json()
+    assert result["created"] == 1
+    assert [(error["line"], error["error"]) for error in result["errors"]] == [
+        (2, "Email already registered"),
+        (4, "Email already registered"),
+        (5, "Expected 4 columns, got 3"),
+        (6, "Quoted field is never closed"),
+    ]
+
+
+def test_jsonl_rows(client, make_user):
+    headers = auth_headers(make_user("Alice").email)
+    body = (
+        '{"name": "Bob", "email": "bob@example.com", "badge_number": "BOB"}\n'
+        "\n"
+        "{not json\n"
+    )
+
+    result = upload(client, headers, body, csv_format=False).json()
+    assert result["created"] == 1
+    assert [error["line"] for error in result["errors"]] == [3]
+
+
+def test_long_line_stops_the_import_but_reports_what_was_created(
+    client, make_user, monkeypatch
+):
+    monkeypatch.setattr(importer, "IMPORT_MAX_LINE", 100)
+    headers = auth_headers(make_user("Alice").email)
+    body = (
+        HEADER
+        + "Bob,bob@example.com,BOB,\n"
+        + "Bob Again,bob@example.com,BOB2,\n"
+        + f"Carol,carol@example.com,{'C' * 200},\n"
+        + "Dave,dave@example.com,DAVE,\n"
+    )
+
+    response = upload(client, headers, body)
+    assert response.status_code == 413
+    detail = response.json()["detail"]
+    assert detail["error"].startswith("Line 4 is longer than 100 bytes")
+    assert detail["created"] == 1
+    assert [error["line"] for error in detail["errors"]] == [3]
+    assert stored_names() == ["Alice", "Bob"]
+
+
+def test_unclosed_quote_is_capped_by_the_line_limit(client, make_user, monkeypatch):
+    monkeypatch.setattr(importer, "IMPORT_MAX_LINE", 100)
+    headers = auth_headers(make_user("Alice").email)
+    body = HEADER + '"Bob\n' + "Bob,bob@example.com,BOB,\n" * 10
+
+    response = upload(client, headers, body)
+    assert response.status_code == 413
+    assert response.json()["detail"]["error"].startswith("Line 2 is longer")
+
+
+def test_import_requires_a_login(client):
+    response = upload(client, {}, HEADER + "Bob,bob@example.com,BOB,\n")
+    assert response.status_code == 401
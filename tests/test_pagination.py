@@ -0,0 +1,59 @@
+from app.pagination import NEXT_CURSOR_HEADER
+
+from .conftest import auth_headers
+
+
+def walk(client, path, headers=None, limit=3):
+    """Follow X-Next-Cursor from the first page; returns the pages' ids."""
+    pages, cursor = [], None
+    while True:
+        params = {"limit": limit} | ({"cursor": cursor} if cursor else {})
+        response = client.get(path, params=params, headers=headers)
+        assert response.status_code == 200
+        pages.append([row["id"] for row in response.json()])
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return pages
+
+
+def test_users_cursor_walks_every_row_once(client, make_user):
+    users = [make_user(f"User{i}") for i in range(7)]
+
+    pages = walk(client, "/users/", auth_headers(users[0].email))
+    assert [len(page) for page in pages] == [3, 3, 1]
+    ids = [row_id for page in pages for row_id in page]
+    assert ids == sorted(str(user.id) for user in users)
+
+
+def test_users_cursor_resumes_after_its_row(client, make_user):
+    users = [make_user(f"User{i}") for i in range(6)]
+    headers = auth_headers(users[0].email)
+    first = client.get("/users/", params={"limit": 3}, headers=headers)
+    last = first.json()[-1]["id"]
+
+    # Unlike OFFSET, rows inserted since do not shift or repeat the next page.
+    users += [make_user(f"Late{i}") for i in range(5)]
+    second = client.get(
+        "/users/",
+        params={"limit": 3, "cursor": first.headers[NEXT_CURSOR_HEADER]},
+        headers=headers,
+    )
+    expected = sorted(str(user.id) for user in users if str(user.id) > last)[:3]
+    assert [row["id"] for row in second.json()] == expected
+
+
+def test_last_full_page_still_advertises_a_cursor(client, make_role):
+    for i in range(4):
+        make_role(f"Role{i}")
+
+    assert [len(page) for page in walk(client, "/roles/", limit=2)] == [2, 2, 0]
+
+
+def test_invalid_cursor_is_rejected(client, make_user):
+    user = make_user("Alice")
+
+    response = client.get(
+        "/users/", params={"cursor": "not-a-cursor"}, headers=auth_headers(user.email)
+    )
+    assert response.status_code == 400
+    assert client.get("/roles/", params={"cursor": "bm9wZQ"}).status_code == 400
@@ -0,0 +1,59 @@
+import pytest
+
+from app import profiler
+
+from .conftest import auth_headers
+
+
+@pytest.fixture
+def profiling(monkeypatch):
+    """Profile on X-DB-Profile and capture the plan of every statement."""
+    monkeypatch.setattr(profiler, "SQL_PROFILE_HEADER", "x-db-profile")
+    monkeypatch.setattr(profiler, "SQL_PROFILE_EXPLAIN_MS", 0)
+    profiler.slow_queries.clear()
+    yield
+    profiler.slow_queries.clear()
+
+
+@pytest.fixture
+def admin_headers(client, make_role, make_user):
+    headers = auth_headers(make_user("Alice", roles=[make_role("admin")]).email)
+    client.get("/users/", headers=headers)  # verifies and caches the token
+    return headers
+
+
+def test_admin_gets_counts_and_plans(client, profiling, admin_headers):
+    response = client.get("/users/", headers=admin_headers | {"X-DB-Profile": "1"})
+
+    # Collection version, the page and its role links, as in test_query_counts.
+    assert response.headers[profiler.QUERIES_HEADER] == "3"
+    assert float(response.headers[profiler.TIME_HEADER]) > 0
+    captured = profiler.stats()
+    assert len(captured) == 3
+    page = next(entry for entry in captured if "FROM users" in entry["statement"])
+    assert page["request"] == "GET /users/"
+    # SELECTs are re-run under EXPLAIN ANALYZE, so the plan has actual timings.
+    assert "actual time=" in page["plan"]
+
+    response = client.get("/internal/slow-queries", headers=admin_headers)
+    assert response.json() == captured
+
+
+def test_fast_statements_are_counted_but_not_explained(
+    client, profiling, admin_headers, monkeypatch
+):
+    monkeypatch.setattr(profiler, "SQL_PROFILE_EXPLAIN_MS", 60_000)
+
+    response = client.get("/users/", headers=admin_headers | {"X-DB-Profile": "1"})
+    assert response.headers[profiler.QUERIES_HEADER] == "3"
+    assert profiler.stats() == []
+
+
+def test_header_is_ignored_for_everyone_else(client, profiling, make_user):
+    headers = auth_headers(make_user("Bob").email)
+    client.get("/users/", headers=headers)
+
+    response = client.get("/users/", headers=headers | {"X-DB-Profile": "1"})
+    assert response.status_code == 200
+    assert profiler.QUERIES_HEADER not in response.headers
+    assert profiler.stats() == []
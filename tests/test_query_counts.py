@@ -0,0 +1,82 @@
+"""Statement counts of the list endpoints, pinned so an N+1 cannot creep back
+in: each test fills enough rows that a per-row query would show up."""
+
+from app.database import engine
+from app.testing import assert_num_queries
+
+from .conftest import auth_headers
+
+
+def seed_users(make_role, make_user, count=10):
+    admin, staff = make_role("Admin"), make_role("Staff")
+    return [make_user(f"User{i}", roles=[admin, staff]) for i in range(count)]
+
+
+def test_list_users(client, api_engine, make_role, make_user):
+    users = seed_users(make_role, make_user)
+    headers = auth_headers(users[0].email)
+    client.get("/users/", headers=headers)  # verifies and caches the token
+
+    # Collection version for the ETag, the page, and its role links.
+    with assert_num_queries(api_engine, 3):
+        response = client.get("/users/", headers=headers)
+    assert len(response.json()) == len(users)
+    assert all(len(user["roles"]) == 2 for user in response.json())
+
+
+def test_list_roles_is_served_from_the_cache(client, api_engine, make_role):
+    for i in range(5):
+        make_role(f"Role{i}")
+
+    with assert_num_queries(api_engine, 0):
+        response = client.get("/roles/")
+    assert len(response.json()) == 5
+
+
+def test_batch_lookup(client, api_engine, make_role, make_user):
+    users = seed_users(make_role, make_user)
+    headers = auth_headers(users[0].email)
+    client.get("/users/", headers=headers)
+
+    with assert_num_queries(api_engine, 2):
+        response = client.post(
+            "/users/batch",
+            headers=headers,
+            json={"by": "email", "keys": [user.email for user in users]},
+        )
+    assert len(response.json()["found"]) == len(users)
+
+
+def register_org_chart(client, users):
+    """users[0] manages everyone else; returns the manager's auth headers."""
+    manager = users[0]
+    for user in users:
+        managers = [] if user is manager else [str(manager.id)]
+        response = client.post(
+            "/employees/", headers=auth_headers(user.email), json={"managers": managers}
+        )
+        assert response.status_code == 200
+    return auth_headers(manager.email)
+
+
+def test_list_employees(client, make_role, make_user):
+    headers = register_org_chart(client, seed_users(make_role, make_user))
+
+    # Employees, then their managers and the managers' roles, one IN each.
+    with assert_num_queries(engine, 3):
+        response = client.get("/employees/", headers=headers)
+    assert len(response.json()) == 10
+
+
+def test_reports_and_managers(client, make_role, make_user):
+    users = seed_users(make_role, make_user)
+    headers = register_org_chart(client, users)
+
+    # The closure rows joined to users, then the users' roles in one IN.
+    with assert_num_queries(engine, 2):
+        response = client.get(f"/users/{users[0].id}/reports", headers=headers)
+    assert len(response.json()) == 9
+
+    with assert_num_queries(engine, 2):
+        response = client.get(f"/users/{users[1].id}/managers", headers=headers)
+    assert [entry["user"]["id"] for entry in response.json()] == [str(users[0].id)]
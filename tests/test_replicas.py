@@ -0,0 +1,113 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import database, models
+from app.replicas import ReplicaSession, ReplicaSet
+
+from .conftest import auth_headers
+
+# Nothing listens here, so connecting is refused at once.
+DEAD_HOST = "127.0.0.1:1"
+
+
+@pytest.fixture
+def dead_replica():
+    """A sync engine for DEAD_HOST and the list of its connect attempts."""
+    engine = create_engine(database._replica_url("postgresql", DEAD_HOST))
+    attempts = []
+    event.listen(engine, "do_connect", lambda *args: attempts.append(time.time()))
+    yield engine, attempts
+    engine.dispose()
+
+
+def live_replica():
+    # Its own engine object, so tests can tell it apart from the fallback.
+    return database.engine.execution_options(postgresql_readonly=True)
+
+
+def test_round_robin_over_replicas(postgres):
+    first, second = live_replica(), live_replica()
+    replicas = ReplicaSet({"first": first, "second": second})
+
+    picked = []
+    for _ in range(4):
+        with replicas.connect() as conn:
+            picked.append(conn.engine)
+    assert picked == [first, second, first, second]
+
+
+def test_dead_replica_is_skipped_then_reprobed(postgres, dead_replica):
+    dead, attempts = dead_replica
+    live = live_replica()
+    replicas = ReplicaSet({"dead": dead, "live": live}, retry_after=0.2)
+
+    with replicas.connect() as conn:
+        assert conn.engine is live
+    assert len(attempts) == 1
+    assert [replica["down"] for replica in replicas.stats()] == [True, False]
+
+    # While it is marked down nobody waits on it.
+    for _ in range(3):
+        replicas.connect().close()
+    assert len(attempts) == 1
+
+    time.sleep(0.25)
+    assert [replica["down"] for replica in replicas.stats()] == [False, False]
+    for _ in range(2):
+        replicas.connect().close()
+    assert len(attempts) == 2
+    assert replicas.stats()[0]["down"]
+
+
+def test_session_falls_back_to_the_read_only_primary(postgres, dead_replica):
+    dead, attempts = dead_replica
+    replicas = ReplicaSet({"dead": dead})
+
+    with ReplicaSession(replicas=replicas, fallback=database.readonly_engine) as db:
+        assert db.scalar(text("SELECT 1")) == 1
+        assert db.get_bind() is database.readonly_engine
+        with pytest.raises(DBAPIError, match="read-only transaction"):
+            db.execute(
+                models.User.__table__.insert().values(
+                    name="X", email="x@example.com", badge_number="X"
+                )
+            )
+    assert len(attempts) == 1
+
+
+def test_session_without_queries_checks_nothing_out(postgres, dead_replica):
+    dead, attempts = dead_replica
+    replicas = ReplicaSet({"dead": dead})
+
+    with ReplicaSession(replicas=replicas, fallback=database.readonly_engine):
+        pass
+    assert attempts == []
+
+
+@pytest.fixture
+def app_replicas(monkeypatch):
+    """Point the app's read sessions at a dead replica, in either mode."""
+    if database.async_engine is None:
+        session_maker = database.ReadSession
+        dead = create_engine(database._replica_url("postgresql", DEAD_HOST))
+    else:
+        session_maker = database.AsyncReadSession
+        dead = create_async_engine(
+            database._replica_url("postgresql+asyncpg", DEAD_HOST)
+        )
+    replicas = ReplicaSet({DEAD_HOST: dead})
+    monkeypatch.setitem(session_maker.kw, "replicas", replicas)
+    return replicas
+
+
+def test_endpoints_survive_a_dead_replica(client, make_user, app_replicas):
+    alice = make_user("Alice")
+
+    response = client.get("/users/", headers=auth_headers(alice.email))
+    assert response.status_code == 200
+    assert [user["name"] for user in response.json()] == ["Alice"]
+    assert app_replicas.stats()[0]["down"]
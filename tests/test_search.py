@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import DBAPIError
+
+from app import crud, database
+
+from .conftest import auth_headers
+
+
+@pytest.fixture(scope="module")
+def trigram_index(postgres):
+    """pg_trgm and the search index of migration 0002; skips without them."""
+    try:
+        with database.engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            conn.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_users_search_trgm ON users "
+                    "USING gist ((name || ' ' || email || ' ' || badge_number) "
+                    "gist_trgm_ops(siglen=64))"
+                )
+            )
+    except DBAPIError as exc:
+        pytest.skip(f"pg_trgm unavailable: {exc.orig}")
+
+
+def search(client, headers, q):
+    response = client.get("/users/search", params={"q": q}, headers=headers)
+    assert response.status_code == 200
+    return [user["name"] for user in response.json()]
+
+
+def test_closest_words_rank_first(client, make_user, trigram_index):
+    for name in ("Alicia", "Bob", "Alice", "Alisson"):
+        make_user(name)
+    headers = auth_headers("alice@example.com")
+
+    names = search(client, headers, "alice")
+    assert names[:2] == ["Alice", "Alicia"]
+    assert "Bob" not in names
+    # A typo still finds the word, and case does not matter.
+    assert search(client, headers, "alicr")[0] == "Alice"
+    assert search(client, headers, "BOB") == ["Bob"]
+
+
+def test_search_uses_the_trigram_index(trigram_index):
+    statement = crud.search_users_statement("alice", 20).compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    )
+    with database.engine.connect() as conn:
+        # The table is tiny; make the planner show what it would do at scale.
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        plan = conn.execute(text(f"EXPLAIN {statement}")).scalars().all()
+    assert any("ix_users_search_trgm" in line for line in plan), plan
@@ -0,0 +1,139 @@
+import pytest
+
+from app import database, skills
+
+from .conftest import auth_headers
+
+
+@pytest.fixture
+def admin_headers(make_role, make_user):
+    return auth_headers(make_user("Root", roles=[make_role("admin")]).email)
+
+
+@pytest.fixture
+def catalog(client, admin_headers):
+    """Skill name -> id across the language and framework facets."""
+    ids = {}
+    for facet, name in (
+        ("language", "Python"),
+        ("language", "Go"),
+        ("framework", "Django"),
+    ):
+        response = client.post(
+            f"/skills/{facet}", headers=admin_headers, json={"name": name}
+        )
+        assert response.status_code == 200
+        ids[name] = response.json()["id"]
+    return ids
+
+
+@pytest.fixture
+def people(client, make_user, catalog):
+    """Alice: Python + Django, Bob: Python, Carol: Go."""
+    people = {}
+    for name, languages, frameworks in (
+        ("Alice", ["Python"], ["Django"]),
+        ("Bob", ["Python"], []),
+        ("Carol", ["Go"], []),
+    ):
+        user = make_user(name)
+        headers = auth_headers(user.email)
+        employee = client.post("/employees/", headers=headers, json={}).json()
+        add_project(client, headers, employee["id"], catalog, languages, frameworks)
+        people[name] = (headers, employee["id"])
+    return people
+
+
+def add_project(client, headers, employee_id, catalog, languages, frameworks=()):
+    project = {
+        "name": "Project",
+        "programming_languages": [catalog[name] for name in languages],
+        "frameworks": [catalog[name] for name in frameworks],
+    }
+    response = client.post(
+        f"/employees/{employee_id}/experiences",
+        headers=headers,
+        json={"company_name": "Acme", "projects": [project]},
+    )
+    assert response.status_code == 200
+
+
+def search(client, people, **params):
+    headers, _ = people["Alice"]
+    response = client.get("/employees/search", params=params, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def names(result, people):
+    by_id = {employee_id: name for name, (_, employee_id) in people.items()}
+    return sorted(by_id[employee["id"]] for employee in result["employees"])
+
+
+def counts(result, facet):
+    return {skill["name"]: skill["count"] for skill in result["facets"][facet]}
+
+
+def test_search_and_facet_counts(client, people):
+    result = search(client, people, language="python")
+
+    assert result["total"] == 2
+    assert names(result, people) == ["Alice", "Bob"]
+    # The language facet ignores its own filter so Go stays selectable.
+    assert counts(result, "language") == {"Python": 2, "Go": 1}
+    assert counts(result, "framework") == {"Django": 1}
+
+
+def test_facets_are_anded_and_names_ored(client, people):
+    result = search(client, people, language=["Python", "Go"])
+    assert names(result, people) == ["Alice", "Bob", "Carol"]
+
+    result = search(client, people, language="Python", framework="Django")
+    assert names(result, people) == ["Alice"]
+
+    result = search(client, people, language=["Python", "Go"], match="all")
+    assert names(result, people) == []
+
+
+def test_new_experience_is_searchable_at_once(client, people, catalog):
+    headers, employee_id = people["Carol"]
+    add_project(client, headers, employee_id, catalog, ["Python"])
+
+    result = search(client, people, language="Python")
+    assert names(result, people) == ["Alice", "Bob", "Carol"]
+
+
+def test_incremental_updates_match_a_full_reload(client, people, catalog):
+    headers, employee_id = people["Bob"]
+    add_project(client, headers, employee_id, catalog, ["Go"], ["Django"])
+    queries = [
+        {"language": "Go"},
+        {"framework": "Django"},
+        {"language": ["Python", "Go"], "match": "all"},
+    ]
+
+    def snapshot():
+        # Page order follows bit slots, which a reload reassigns; compare sets.
+        results = [search(client, people, **query) for query in queries]
+        return [
+            (result["total"], names(result, people), result["facets"])
+            for result in results
+        ]
+
+    incremental = snapshot()
+    with database.Session() as db:
+        skills.refresh(db)
+    assert snapshot() == incremental
+
+
+def test_only_admins_add_skills(client, make_user, admin_headers):
+    skill = {"name": "Rust"}
+    assert client.post("/skills/language", json=skill).status_code == 401
+    headers = auth_headers(make_user("Alice").email)
+    assert (
+        client.post("/skills/language", headers=headers, json=skill).status_code == 403
+    )
+
+    response = client.post("/skills/language", headers=admin_headers, json=skill)
+    assert response.status_code == 200
+    assert [s["name"] for s in client.get("/skills/language").json()] == ["Rust"]